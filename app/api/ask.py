@@ -0,0 +1,143 @@
+from fastapi import APIRouter, Request, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import aclosing
+from typing import List, Literal, Optional
+import asyncio
+import json
+from app.services.sec.sec_url import find_cik
+from app.services.retrieval_cache import retrieval_cache
+
+router = APIRouter()
+
+# kept first and byte-identical in every prompt so llama.cpp can reuse its KV cache
+PREAMBLE = (
+    "You are a financial research assistant. Answer the question using only the "
+    "numbered context passages below and cite them as [n]. If the context does not "
+    "contain the answer, say so.\n\n"
+)
+
+
+def build_prompt(question: str, nodes) -> str:
+    context = "\n\n".join(f"[{i}] {n.node.get_content()}" for i, n in enumerate(nodes, 1))
+    return f"{PREAMBLE}Context:\n{context}\n\nQuestion: {question}\nAnswer:"
+
+
+def _source(i: int, n) -> dict:
+    meta = n.node.metadata
+    return {
+        "n": i,
+        "score": n.score,
+        **{key: meta[key] for key in ("title", "ticker", "form", "date", "page") if key in meta}
+    }
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _unavailable(components, name: str) -> JSONResponse:
+    return JSONResponse(
+        content={
+            "error": f"Component '{name}' is not available",
+            "status": components.status.get(name),
+            "detail": components.errors.get(name)
+        },
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
+def _busy() -> JSONResponse:
+    return JSONResponse(
+        content={"error": "Too many questions in flight, try again shortly"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "5"}
+    )
+
+
+@router.get("/answer")
+async def answer(
+    request: Request,
+    q: str = Query(..., min_length=3, description="Question"),
+    source: Literal["buffett", "sec"] = Query("buffett", description="Buffett corpus or a company's SEC filings"),
+    ticker: Optional[str] = Query(None, description="Company ticker (source=sec)"),
+    mode: Literal["vector", "lexical", "hybrid"] = Query("vector", description="SEC retrieval: dense, BM25 or both"),
+    k: int = Query(5, ge=1, le=20, description="# of context passages")
+):
+    """Retrieve context, then stream the answer as server-sent events:
+    ``sources`` once, ``token`` per generated piece, then ``done`` or ``error``."""
+    components = request.app.state.components
+    scheduler = request.app.state.llm_scheduler
+    try:
+        # refuse before spending an embedding call and a vector search on it
+        scheduler.ensure_capacity()
+    except asyncio.QueueFull:
+        return _busy()
+
+    if source == "sec":
+        if not ticker:
+            return JSONResponse(content={"error": "ticker is required for source=sec"}, status_code=status.HTTP_400_BAD_REQUEST)
+        cik, success = find_cik(ticker)
+        if not success:
+            return JSONResponse(content={"error": cik}, status_code=status.HTTP_404_NOT_FOUND)
+        try:
+            embedder = await components.get("embedder")
+        except Exception:
+            return _unavailable(components, "embedder")
+        # checked first: retriever() would create an empty collection and BM25 file
+        if not await asyncio.to_thread(embedder.has_collection, cik):
+            return JSONResponse(
+                content={"error": f"No filings ingested for {ticker.upper()}; analyze them first (POST /api/jobs)"},
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        # the first lexical/hybrid use of a CIK builds its BM25 index: keep it off the loop
+        retriever = await asyncio.to_thread(embedder.retriever, cik, k, mode)
+    else:
+        try:
+            retriever = await components.get("wb_retriever")
+        except Exception:
+            return _unavailable(components, "wb_retriever")
+
+    nodes: List = (await retriever.aretrieve(q))[:k]
+
+    try:
+        # the queue may have filled up while we were retrieving
+        job = scheduler.submit(build_prompt(q, nodes))
+    except asyncio.QueueFull:
+        return _busy()
+
+    async def events():
+        yield _sse("sources", [_source(i, n) for i, n in enumerate(nodes, 1)])
+        try:
+            # aclosing: a client disconnect closes the stream, which cancels the job
+            async with aclosing(scheduler.stream(job)) as tokens:
+                async for token in tokens:
+                    yield _sse("token", {"text": token})
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+            return
+        yield _sse("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stats")
+async def get_llm_stats(request: Request):
+    return request.app.state.llm_scheduler.metrics()
+
+
+@router.get("/retrieval_cache")
+async def get_retrieval_cache_stats():
+    return retrieval_cache.metrics()
+
+
+@router.get("/embedding_cache")
+async def get_embedding_cache_stats(request: Request):
+    components = request.app.state.components
+    if not components.ready("embedding_model"):
+        return _unavailable(components, "embedding_model")
+    embedding_model = await components.get("embedding_model")
+    return await asyncio.to_thread(embedding_model.stats)
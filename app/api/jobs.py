@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Request, Query, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import asyncio
+
+router = APIRouter()
+
+
+class SubmitJobRequest(BaseModel):
+    ticker: str = Field(..., min_length=1)
+    top: int = Field(5, ge=1, le=10, description="How many top filings per form")
+    forms: Optional[List[str]] = Field(None, description="Form types to analyze (default: all supported)")
+    refresh: bool = Field(False, description="Re-diff filings already in the store")
+
+
+class SubmitJobsRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=1000)
+    top: int = Field(5, ge=1, le=10)
+    forms: Optional[List[str]] = None
+    refresh: bool = False
+
+
+def _queue_full() -> JSONResponse:
+    return JSONResponse(
+        content={"error": "Job backlog is full, try again later"},
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "60"}
+    )
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(request: Request, body: SubmitJobRequest):
+    try:
+        job, created = request.app.state.jobs.submit(body.ticker, body.top, body.forms, body.refresh)
+    except asyncio.QueueFull:
+        return _queue_full()
+    return {"job_id": job.id, "deduplicated": not created, "status": job.status}
+
+
+@router.post("/batch", status_code=status.HTTP_202_ACCEPTED)
+async def submit_jobs(request: Request, body: SubmitJobsRequest):
+    jobs, results = request.app.state.jobs, []
+    for ticker in dict.fromkeys(t.upper() for t in body.tickers):
+        try:
+            job, created = jobs.submit(ticker, body.top, body.forms, body.refresh)
+        except asyncio.QueueFull:
+            results.append({"ticker": ticker, "error": "backlog full"})
+            continue
+        results.append({"ticker": ticker, "job_id": job.id, "deduplicated": not created})
+    return {"count": len(results), "jobs": results}
+
+
+@router.get("")
+async def list_jobs(
+    request: Request,
+    status_: Optional[str] = Query(None, alias="status", description="queued | running | done | failed | cancelled"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    jobs = request.app.state.jobs
+    return {
+        **jobs.metrics(),
+        "jobs": [job.to_dict() for job in jobs.list(status_)[-limit:]]
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(request: Request, job_id: str):
+    job = request.app.state.jobs.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"Unknown job '{job_id}'"}, status_code=status.HTTP_404_NOT_FOUND)
+    return job.to_dict()
+
+
+@router.delete("/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    job = request.app.state.jobs.cancel(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"Unknown job '{job_id}'"}, status_code=status.HTTP_404_NOT_FOUND)
+    return job.to_dict()
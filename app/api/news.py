@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query, HTTPException, status
+from fastapi import APIRouter, Request, Query, HTTPException, status
 from typing import List, Dict, Any
 from app.services.news_service import NewsService
 
@@ -11,7 +11,7 @@ async def get_stock_news(
     limit: int = Query(10, ge=1, le=20, description="# of returned news")
 ):
     try:
-        news_items = news_service.get_stock_news(ticker.upper(), limit)
+        news_items = await news_service.get_stock_news(ticker.upper(), limit)
         return {
             "ticker": ticker.upper(),
             "count": len(news_items),
@@ -22,3 +22,37 @@ async def get_stock_news(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error while retrieving the news: {str(e)}"
         )
+
+
+@router.get("/prefetch_stats")
+async def get_prefetch_stats(request: Request):
+    prefetcher = getattr(request.app.state, "news_prefetcher", None)
+    return prefetcher.metrics() if prefetcher else news_service.metrics()
+
+
+@router.get("/batch_news")
+async def get_batch_news(
+    tickers: str = Query(..., description="Comma-separated stock symbols (ex: AAPL,MSFT,NVDA)"),
+    limit: int = Query(10, ge=1, le=20, description="# of news per symbol"),
+    concurrency: int = Query(10, ge=1, le=32, description="Max feeds fetched at once")
+):
+    symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    if not symbols or len(symbols) > 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide between 1 and 100 comma-separated tickers."
+        )
+
+    try:
+        result = await news_service.get_many_stock_news(symbols, limit, concurrency)
+        return {
+            "tickers": list(result["symbols"]),
+            "count": len(result["merged"]),
+            "merged": result["merged"],
+            "by_ticker": result["symbols"]
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error while retrieving the news: {str(e)}"
+        )
@@ -1,9 +1,11 @@
 from fastapi import APIRouter
-from app.api import sec, news
+from app.api import sec, news, ask, jobs
 
 
 api_router = APIRouter()
 
 
 api_router.include_router(sec.router, prefix="/sec", tags=["sec"])
-api_router.include_router(news.router, prefix="/news", tags=["news"])
\ No newline at end of file
+api_router.include_router(news.router, prefix="/news", tags=["news"])
+api_router.include_router(ask.router, prefix="/ask", tags=["ask"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
\ No newline at end of file
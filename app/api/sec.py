@@ -1,14 +1,20 @@
-from fastapi import APIRouter, status, Query
-from fastapi.responses import JSONResponse
-from typing import List, Dict
-from app.services.sec.sec_url import update_company_tickers_json, find_cik, SECFilingClient
+from fastapi import APIRouter, Request, status, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional
+import asyncio
+import json
+from app.services.sec.sec_url import update_company_tickers_json, find_cik, find_ticker, ticker_index, SECFilingClient
+from app.services.sec.sec_tables import query_tables
+from app.services.sec.sec_ratelimit import sec_limiter
 
 router = APIRouter()
 
 
 @router.get("/update_tickers")
 async def update_tickers_json():
-    msg, error_code = update_company_tickers_json()
+    # requests + the rate limiter's blocking wait: keep them off the event loop
+    msg, error_code = await asyncio.to_thread(update_company_tickers_json)
 
     message = "Update successful" if error_code == 1 else f"Update failed: {msg}"
     code = status.HTTP_200_OK if error_code == 1 else status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -25,26 +31,39 @@ async def get_cik(ticker: str):
     return JSONResponse(content={"ticker": ticker.upper(), "result": result}, status_code=code)
 
 
-@router.get("/sec_doc_urls")
-def get_sec_doc_urls(
-    ticker: str,
-    top: int = Query(5, ge=1, le=10, description="How many top filings to consider")
+@router.get("/rate_limit")
+async def get_rate_limit_stats():
+    return sec_limiter.metrics()
+
+
+@router.get("/ticker")
+async def get_ticker(cik: str):
+    result, error_code = find_ticker(cik=cik)
+
+    code = status.HTTP_200_OK if error_code == 1 else status.HTTP_404_NOT_FOUND
+
+    return JSONResponse(content={"cik": cik.zfill(10), "result": result}, status_code=code)
+
+
+@router.get("/search_tickers")
+async def search_tickers(
+    q: str = Query(..., min_length=1, description="Ticker prefix or approximate symbol"),
+    limit: int = Query(10, ge=1, le=50, description="Max # of matches")
 ):
+    return {"query": q.upper(), "results": ticker_index.search(q, limit)}
+
+
+async def _doc_urls(ticker: str, top: int, metadata_client, forms: List[str] | None = None) -> tuple[Dict, int]:
+    """Resolve one ticker to its filing URLs. Returns (payload, http status)."""
     cik, success = find_cik(ticker)
     if not success:
-        return JSONResponse(
-            content={"error": cik},
-            status_code=status.HTTP_404_NOT_FOUND
-        )
+        return {"error": cik}, status.HTTP_404_NOT_FOUND
 
     try:
         client = SECFilingClient(ticker)
-        meta, meta_ok = client.fetch_metadata(top)
+        meta, meta_ok = await client.afetch_metadata(top, metadata_client, forms)
         if meta_ok == 0:
-            return JSONResponse(
-                content={"error": meta},
-                status_code=status.HTTP_502_BAD_GATEWAY
-            )
+            return {"error": meta}, status.HTTP_502_BAD_GATEWAY
 
         filings: List[Dict] = []
         for i in range(len(client.filing_metadata)):
@@ -60,10 +79,83 @@ def get_sec_doc_urls(
             "ticker": ticker.upper(),
             "cik": client.cik,
             "filings": filings
-        }
+        }, status.HTTP_200_OK
 
     except (IndexError, ValueError) as e:
-        return JSONResponse(
-            content={"error": str(e)},
-            status_code=status.HTTP_400_BAD_REQUEST
-        )
+        return {"error": str(e)}, status.HTTP_400_BAD_REQUEST
+
+
+@router.get("/sec_doc_urls")
+async def get_sec_doc_urls(
+    request: Request,
+    ticker: str,
+    top: int = Query(5, ge=1, le=10, description="How many top filings to consider")
+):
+    content, code = await _doc_urls(ticker, top, request.app.state.metadata_client)
+    if code != status.HTTP_200_OK:
+        return JSONResponse(content=content, status_code=code)
+    return content
+
+
+class BatchDocUrlsRequest(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=500)
+    forms: Optional[List[str]] = Field(None, description="Form types to keep (default: all supported)")
+    top: int = Field(5, ge=1, le=10, description="How many top filings per form")
+    concurrency: int = Field(16, ge=1, le=64, description="Max tickers resolved at once")
+
+
+@router.post("/sec_doc_urls/batch")
+async def get_sec_doc_urls_batch(
+    request: Request,
+    body: BatchDocUrlsRequest,
+    stream: bool = Query(False, description="Stream NDJSON rows as each ticker completes")
+):
+    metadata_client = request.app.state.metadata_client
+    sem = asyncio.Semaphore(body.concurrency)
+    tickers = list(dict.fromkeys(t.upper() for t in body.tickers))
+
+    async def one(ticker: str) -> Dict:
+        async with sem:
+            try:
+                content, code = await _doc_urls(ticker, body.top, metadata_client, body.forms)
+            except Exception as e:
+                content, code = {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
+        return {"ticker": ticker, "status": code, **content}
+
+    if stream:
+        async def rows():
+            tasks = [asyncio.create_task(one(t)) for t in tickers]
+            try:
+                for fut in asyncio.as_completed(tasks):
+                    yield json.dumps(await fut) + "\n"
+            finally:
+                # client went away: stop fetching metadata nobody will read
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*(one(t) for t in tickers))
+    return {
+        "count": len(results),
+        "errors": sum(1 for r in results if r["status"] != status.HTTP_200_OK),
+        "results": results
+    }
+
+
+@router.get("/tables")
+async def get_tables(
+    ticker: str,
+    form: Optional[str] = Query(None, description="Form type, e.g. 10-K"),
+    date_from: Optional[str] = Query(None, description="Earliest report date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Latest report date (YYYY-MM-DD)"),
+    title: Optional[str] = Query(None, description="Case-insensitive substring of the table title"),
+    limit: int = Query(20, ge=1, le=200, description="Max # of tables returned")
+):
+    tables = await asyncio.to_thread(query_tables, ticker, form, date_from, date_to, title, limit)
+    return {
+        "ticker": ticker.upper(),
+        "count": len(tables),
+        "tables": tables
+    }
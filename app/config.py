@@ -19,6 +19,29 @@ class Settings(BaseSettings):
 
     sec_cache_dir: str = os.path.join(os.getcwd(), os.getenv("SEC_CACHE_DIR"))
     sec_vector_db: str = os.path.join(os.getcwd(), os.getenv("SEC_VECTOR_DB"))
+    sec_tables_dir: str = os.path.join(os.getcwd(), os.getenv("SEC_TABLES_DIR", "sec_tables"))
+    sec_lexical_dir: str = os.path.join(os.getcwd(), os.getenv("SEC_LEXICAL_DIR", "sec_lexical"))
+
+    # filing cache size cap (bytes); least recently used filings are evicted first
+    SEC_CACHE_MAX_BYTES: int = int(os.getenv("SEC_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+
+    # "zstd" (needs zstandard), "gzip" or empty for raw HTML on disk
+    SEC_CACHE_COMPRESSION: str = os.getenv("SEC_CACHE_COMPRESSION", "")
+
+    # persistent embedding cache shared by the SEC and Buffett pipelines
+    EMBED_CACHE_PATH: str = os.path.join(os.getcwd(), os.getenv("EMBED_CACHE_PATH", "embed_cache.sqlite3"))
+    EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+    # EDGAR fair-access budget (requests/s), shared evenly by this many server processes
+    SEC_RATE_LIMIT: float = float(os.getenv("SEC_RATE_LIMIT", "10"))
+    SEC_RATE_WORKERS: int = int(os.getenv("SEC_RATE_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+
+    # concurrent background filing analyses (POST /api/jobs)
+    SEC_JOB_WORKERS: int = int(os.getenv("SEC_JOB_WORKERS", "2"))
+
+    # 0 parses filings inline, N>0 uses a process pool of N workers
+    SEC_PARSE_WORKERS: int = int(os.getenv("SEC_PARSE_WORKERS", "0"))
 
     class Config:
         env_file = ".env"
@@ -1,48 +1,104 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from contextlib import asynccontextmanager
-from aioprometheus import Registry, Counter, Histogram
 from aioprometheus.asgi.starlette import metrics
 
 from app.api.routes import api_router
-from .setup import construct_db_llm
+from app.config import settings
+from app.api.news import news_service
+from .services.news_prefetcher import NewsPrefetcher
+from .setup import load_embedding_model, load_buffett_retriever, load_llm
+from .services.components import Components
+from .services.metrics import MetricsMiddleware, registry
+from .services.llm_scheduler import LLMScheduler
 from .services.sec.sec_downloader import SecDownloader
 from .services.sec.sec_embedder import SecEmbedder
+from .services.sec.sec_metadata import SecMetadataClient
+from .services.sec.sec_jobs import JobQueue
+from .services.sec.sec_url import ticker_index
+from .services.sec.sec_html_parser import shutdown_parse_pool
 
 from fastapi.middleware.cors import CORSMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    embed_model, wb_retriever, llm = construct_db_llm()
-    app.state.embedding_model = embed_model
-    app.state.wb_retriever    = wb_retriever
-    app.state.llm             = llm
+    try:
+        ticker_index.load()
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Ticker index not loaded: {e}")
+
+    # heavy components load in the background; routes that need them await
+    # app.state.components.get(name), the rest serve right away
+    components = Components()
+    components.register("embedding_model", load_embedding_model,
+                        on_ready=lambda v: setattr(app.state, "embedding_model", v))
+    components.register("wb_retriever", load_buffett_retriever, deps=["embedding_model"],
+                        on_ready=lambda v: setattr(app.state, "wb_retriever", v))
+    components.register("llm", load_llm,
+                        on_ready=lambda v: setattr(app.state, "llm", v))
+    components.register("embedder", SecEmbedder, deps=["embedding_model"],
+                        on_ready=lambda v: setattr(app.state, "embedder", v))
+    app.state.components = components
+    components.start()
+
+    # one llama.cpp context: every generation goes through this queue
+    app.state.llm_scheduler = LLMScheduler(lambda: components.get("llm"))
+    app.state.llm_scheduler.start()
+
+    app.state.news_prefetcher = NewsPrefetcher(news_service)
+    app.state.news_prefetcher.start()
 
     app.state.downloader = SecDownloader()
-    app.state.embedder   = SecEmbedder(embed_model)
+    app.state.metadata_client = SecMetadataClient(app.state.downloader)
 
+    app.state.jobs = JobQueue(components, app.state.downloader, app.state.metadata_client,
+                              workers=settings.SEC_JOB_WORKERS)
+    app.state.jobs.start()
 
-    reg = Registry()
-    app.state.counter = Counter("req_total", "requests")
-    app.state.latency = Histogram("req_latency", "latency", buckets=[.1,.5,1,1.5,2])
-    reg.register(app.state.counter)
-    reg.register(app.state.latency)
+    # request metrics come from MetricsMiddleware, stage timings from metrics.timed()
+    app.state.registry = registry
     app.add_route("/metrics", metrics, include_in_schema=False)
 
     try:
         yield
     finally:
+        await app.state.jobs.stop()
+        await app.state.llm_scheduler.stop()
+        await components.stop()
         await app.state.downloader.aclose()
+        await app.state.news_prefetcher.stop()
+        await news_service.aclose()
+        shutdown_parse_pool()
 
 app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 app.add_middleware(CORSMiddleware, allow_origins=["*"])
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router, prefix="/api")
 
 
+@app.get("/healthz", include_in_schema=False)
+async def liveness():
+    return {"status": "alive"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readiness(component: str = None):
+    components = app.state.components
+    names = [component] if component else []
+    if component and component not in components.status:
+        return JSONResponse(content={"error": f"Unknown component '{component}'"}, status_code=status.HTTP_404_NOT_FOUND)
+
+    ready = components.ready(*names)
+    return JSONResponse(
+        content={"ready": ready, "components": components.report()},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+
 @app.get("/")
 async def root():
     return FileResponse("app/static/index.html")
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Resumable builder for the Warren_Buffett Chroma collection.
+
+    python -m app.services.buffett_ingest [--concurrency 8] [--batch-size 32]
+
+Every source section (PDF page or CSV row) is identified by a hash of its
+content. Summaries are checkpointed in SQLite under that hash as soon as they
+come back from Ollama, so an interrupted run resumes where it stopped, and
+records in the collection use the hash as their ID: unchanged sections are
+skipped, new ones are summarized + embedded, removed ones are deleted.
+
+Collections built by the old loader use random uuid IDs. On the first run
+every one of those records is replaced; their stored summaries are matched
+to the sections by text and reused, so that migration re-embeds the corpus
+but only summarizes sections whose text changed.
+
+Cached /api/ask results for the collection are dropped after a build. That
+only reaches the server's cache when the build runs inside it (first start);
+a server running next to the CLI serves cached results for up to the
+RetrievalCache ttl (1 hour) before it sees the new records.
+"""
+from typing import Dict, List, Tuple
+import argparse, asyncio, hashlib, json, os, sqlite3
+import chromadb
+import pandas as pd
+from tqdm import tqdm
+from llama_index.core import SimpleDirectoryReader, Document
+from llama_index.core.llms import ChatMessage
+from llama_index.llms.ollama import Ollama
+from app.services.retrieval_cache import retrieval_cache
+
+
+DB_PATH = os.path.join(os.getcwd(), "buffett_db")
+CHECKPOINT_PATH = os.path.join(DB_PATH, "summaries.sqlite3")
+COLLECTION = "Warren_Buffett"
+
+PDF_FILES = ["data/BUFFET.pdf", "data/ownman.pdf"]
+CSV_FILES = ["data/annual_meeting_transcript.csv", "data/special letter from buffett.csv"]
+PDF_TITLE = "An Owner's Manual By Warren E. Buffett"
+
+
+def content_hash(doc: Document) -> str:
+    payload = json.dumps({"text": doc.text, "metadata": doc.metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def summary_prompt(text: str) -> str:
+    return (
+        f"Here is the content of the section:\n\n{text}\n\n"
+        "Provide a summary (a single paragraph) of the content."
+    )
+
+
+def load_sources() -> List[Document]:
+    docs = SimpleDirectoryReader(input_files=PDF_FILES).load_data()
+    for doc in docs:
+        doc.metadata["title"] = PDF_TITLE
+
+    for path in CSV_FILES:
+        df = pd.read_csv(path)
+        for row in df.itertuples(index=False):
+            metadata = {key: getattr(row, key) for key in row._fields if key != "content"}
+            docs.append(Document(text=row.content, metadata=metadata))
+    return docs
+
+
+class SummaryCheckpoint:
+    def __init__(self, path: str = CHECKPOINT_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS summaries (hash TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+        self._db.commit()
+
+    def get_many(self, hashes: List[str]) -> Dict[str, str]:
+        found = {}
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT hash, summary FROM summaries WHERE hash IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def put(self, key: str, summary: str) -> None:
+        self.put_many([(key, summary)])
+
+    def put_many(self, items: List[Tuple[str, str]]) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO summaries (hash, summary) VALUES (?, ?)", items)
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def reuse_summaries(collection, ids: List[str], by_hash: Dict[str, Document], checkpoint: SummaryCheckpoint) -> int:
+    """Checkpoint the summaries of records about to be deleted, keyed by the
+    hashes of current sections with the same text (summaries only depend on it)."""
+    by_text: Dict[str, List[str]] = {}
+    for key, doc in by_hash.items():
+        by_text.setdefault(doc.text, []).append(key)
+
+    items = []
+    for start in range(0, len(ids), 5000):
+        got = collection.get(ids=ids[start:start + 5000], include=["documents", "metadatas"])
+        for text, metadata in zip(got["documents"], got["metadatas"]):
+            summary = (metadata or {}).get("summary")
+            if summary:
+                items.extend((key, summary) for key in by_text.get(text, ()))
+    checkpoint.put_many(items)
+    return len(items)
+
+
+async def build_corpus(embedding_model, concurrency: int = 8, batch_size: int = 32) -> Dict[str, int]:
+    docs = load_sources()
+    hashes = [content_hash(doc) for doc in docs]
+    by_hash = dict(zip(hashes, docs))  # identical sections collapse into one record
+
+    collection = chromadb.PersistentClient(path=DB_PATH).get_or_create_collection(name=COLLECTION)
+    existing = set(collection.get(include=[])["ids"])
+
+    checkpoint = SummaryCheckpoint()
+    stale = existing - set(by_hash)
+    reused = 0
+    if stale:
+        reused = reuse_summaries(collection, list(stale), by_hash, checkpoint)
+        legacy = sum(1 for i in stale if len(i) != 64)
+        if legacy:
+            print(f"Replacing {legacy} records with pre-hash (uuid) IDs in '{COLLECTION}': "
+                  f"{reused} sections keep their summary, the whole corpus is re-embedded")
+        collection.delete(ids=list(stale))
+
+    todo = [h for h in by_hash if h not in existing]
+    summaries = checkpoint.get_many(todo)
+    report = {"unchanged": len(by_hash) - len(todo), "deleted": len(stale), "reused": reused,
+              "resumed": len(summaries), "summarized": 0, "added": 0}
+
+    sub_llm = Ollama(model="llama3.2", request_timeout=120.0, json_mode=True, ollama_additional_kwargs={ "max_tokens": 4096 })
+    sem = asyncio.Semaphore(concurrency)
+    buffer: List[str] = []
+
+    def flush():
+        if not buffer:
+            return
+        batch_docs = [by_hash[h] for h in buffer]
+        texts = [doc.text for doc in batch_docs]
+        metadatas = [{**doc.metadata, "summary": summaries[h]} for h, doc in zip(buffer, batch_docs)]
+        collection.add(
+            ids=list(buffer),
+            documents=texts,
+            embeddings=embedding_model.get_text_embedding_batch(texts),
+            metadatas=metadatas
+        )
+        report["added"] += len(buffer)
+        buffer.clear()
+
+    async def summarize(key: str) -> Tuple[str, str]:
+        async with sem:
+            response = await sub_llm.achat([ChatMessage(role="user", content=summary_prompt(by_hash[key].text))])
+        summary = response.message.content
+        checkpoint.put(key, summary)
+        return key, summary
+
+    try:
+        # already summarized in an earlier run: straight to the collection
+        for key in todo:
+            if key in summaries:
+                buffer.append(key)
+                if len(buffer) >= batch_size:
+                    await asyncio.to_thread(flush)
+
+        pending = [summarize(key) for key in todo if key not in summaries]
+        for fut in tqdm(asyncio.as_completed(pending), total=len(pending), desc="Summarizing sections"):
+            key, summary = await fut
+            summaries[key] = summary
+            report["summarized"] += 1
+            buffer.append(key)
+            if len(buffer) >= batch_size:
+                await asyncio.to_thread(flush)
+
+        await asyncio.to_thread(flush)
+    finally:
+        checkpoint.close()
+        if report["added"] or report["deleted"]:
+            retrieval_cache.invalidate(COLLECTION)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build or update the Warren_Buffett vector collection.",
+        epilog="The first run over a collection built by the old loader (uuid IDs) replaces every record: "
+               "all sections are re-embedded, and sections whose stored summary can't be matched by text "
+               "are summarized again through Ollama."
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent summarization requests to Ollama")
+    parser.add_argument("--batch-size", type=int, default=32, help="Sections embedded and written per batch")
+    args = parser.parse_args()
+
+    from app.setup import load_embedding_model  # app.setup imports this module
+
+    report = asyncio.run(build_corpus(load_embedding_model(), args.concurrency, args.batch_size))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Background loading of heavy app components (models, vector stores).
+
+Components are registered with a blocking loader and their dependencies, then
+loaded in worker threads after the server has started accepting requests.
+Routes that need one ``await components.get(name)``; everything else is
+served immediately. ``report()`` backs the readiness endpoint.
+"""
+from typing import Any, Callable, Dict, Iterable, Optional
+import asyncio, time
+
+
+class Components:
+    def __init__(self):
+        self._loaders: Dict[str, tuple] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.status: Dict[str, str] = {}      # pending | loading | ready | failed
+        self.errors: Dict[str, str] = {}
+        self.load_seconds: Dict[str, float] = {}
+
+    def register(self, name: str, loader: Callable[..., Any], deps: Iterable[str] = (), on_ready: Optional[Callable[[Any], None]] = None):
+        """``loader(*dep_values)`` runs in a thread once every dependency is ready."""
+        self._loaders[name] = (loader, tuple(deps), on_ready)
+        self.status[name] = "pending"
+
+    async def _load(self, name: str) -> Any:
+        loader, deps, on_ready = self._loaders[name]
+        try:
+            values = []
+            for dep in deps:
+                try:
+                    values.append(await self.get(dep))
+                except Exception as e:
+                    raise RuntimeError(f"dependency {dep} failed: {e}") from e
+            self.status[name] = "loading"
+            started = time.monotonic()
+            value = await asyncio.to_thread(loader, *values)
+        except Exception as e:
+            self.status[name] = "failed"
+            self.errors[name] = str(e)
+            print(f"Component '{name}' failed to load: {e}")
+            raise
+        self.load_seconds[name] = round(time.monotonic() - started, 3)
+        self.status[name] = "ready"
+        if on_ready is not None:
+            on_ready(value)
+        return value
+
+    def start(self):
+        for name in self._loaders:
+            if name not in self._tasks:
+                self._tasks[name] = asyncio.create_task(self._load(name))
+                # failures are reported through status; don't log "never retrieved"
+                self._tasks[name].add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def get(self, name: str) -> Any:
+        """Wait for a component; raises if it failed to load."""
+        if name not in self._tasks:
+            raise KeyError(f"Unknown component '{name}'")
+        return await asyncio.shield(self._tasks[name])
+
+    def ready(self, *names: str) -> bool:
+        return all(self.status.get(n) == "ready" for n in (names or self.status))
+
+    def report(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "status": status,
+                "seconds": self.load_seconds.get(name),
+                "error": self.errors.get(name)
+            }
+            for name, status in self.status.items()
+        }
+
+    async def stop(self):
+        # loaders already running in threads finish on their own
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
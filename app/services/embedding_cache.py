@@ -0,0 +1,154 @@
+"""
+Persistent embedding cache shared by the SEC and Buffett pipelines.
+
+CachedEmbedding wraps any llama_index embedding model. Vectors are stored in
+SQLite keyed by sha256(model, kind, text); only cache misses reach the wrapped
+model, split into ``batch_size`` requests of which ``max_concurrency`` run at
+once. Because it is a regular BaseEmbedding it can be passed anywhere an
+``embed_model`` is expected (VectorStoreIndex, SecEmbedder, ...).
+"""
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+import asyncio, hashlib, sqlite3, threading
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import PrivateAttr
+from app.config import settings
+
+
+class CachedEmbedding(BaseEmbedding):
+    _inner: BaseEmbedding = PrivateAttr()
+    _db: sqlite3.Connection = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _pool: Any = PrivateAttr(default=None)
+    _batch_size: int = PrivateAttr()
+    _max_concurrency: int = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, inner: BaseEmbedding, path: str = None, batch_size: int = None, max_concurrency: int = None, **kwargs: Any):
+        # the outer batch is large on purpose: cache lookups happen per call and
+        # misses are re-batched below with ``batch_size``
+        super().__init__(model_name=inner.model_name, embed_batch_size=2048, **kwargs)
+        self._inner = inner
+        self._batch_size = batch_size or settings.EMBED_BATCH_SIZE
+        self._max_concurrency = max_concurrency or settings.EMBED_CONCURRENCY
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path or settings.EMBED_CACHE_PATH, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        self._db.commit()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    # ---------- cache ----------
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, Embedding]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # stay under SQLite's variable limit
+                batch = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def _store(self, items: Dict[str, Embedding]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(key, array("f", vec).tobytes()) for key, vec in items.items()]
+            )
+            self._db.commit()
+
+    def _split(self, texts: List[str], kind: str):
+        """-> (keys per text, cached vectors, texts that still need embedding)"""
+        keys = [self._key(kind, t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        with self._lock:
+            self._hits += len(texts) - len(missing)
+            self._misses += len(missing)
+        return keys, found, missing
+
+    # ---------- sync ----------
+    def _embed_missing(self, missing: Dict[str, str]) -> Dict[str, Embedding]:
+        if not missing:
+            return {}
+        keys, texts = list(missing), list(missing.values())
+        batches = [texts[i:i + self._batch_size] for i in range(0, len(texts), self._batch_size)]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        vectors = [v for batch in self._pool.map(self._inner.get_text_embedding_batch, batches) for v in batch]
+        embedded = dict(zip(keys, vectors))
+        self._store(embedded)
+        return embedded
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, found, missing = self._split(texts, "text")
+        found.update(self._embed_missing(missing))
+        return [found[k] for k in keys]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        keys, found, missing = self._split([query], "query")
+        if missing:
+            vec = self._inner.get_query_embedding(query)
+            self._store({keys[0]: vec})
+            return vec
+        return found[keys[0]]
+
+    # ---------- async ----------
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, found, missing = await asyncio.to_thread(self._split, texts, "text")
+        if missing:
+            sem = asyncio.Semaphore(self._max_concurrency)
+            miss_keys, miss_texts = list(missing), list(missing.values())
+
+            async def run(batch: List[str]) -> List[Embedding]:
+                async with sem:
+                    return await self._inner.aget_text_embedding_batch(batch)
+
+            results = await asyncio.gather(*(
+                run(miss_texts[i:i + self._batch_size]) for i in range(0, len(miss_texts), self._batch_size)
+            ))
+            embedded = dict(zip(miss_keys, (v for batch in results for v in batch)))
+            await asyncio.to_thread(self._store, embedded)
+            found.update(embedded)
+        return [found[k] for k in keys]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        keys, found, missing = await asyncio.to_thread(self._split, [query], "query")
+        if missing:
+            vec = await self._inner.aget_query_embedding(query)
+            await asyncio.to_thread(self._store, {keys[0]: vec})
+            return vec
+        return found[keys[0]]
+
+    # ---------- metrics ----------
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": entries,
+        }
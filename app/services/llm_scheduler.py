@@ -0,0 +1,191 @@
+"""
+Serialized access to the single llama.cpp model.
+
+llama.cpp keeps one context (and one KV cache) per model instance, so
+generations must not overlap. Every request is submitted to a bounded FIFO
+queue and a single worker streams completions one at a time; when the queue is
+full ``submit`` raises ``asyncio.QueueFull`` right away instead of letting
+waits grow without bound. Tokens are handed back to the caller as they are
+produced, and a caller that goes away cancels its job (queued or running).
+
+KV reuse: llama.cpp re-evaluates only the part of a prompt after the longest
+prefix shared with the previous one, so prompts should start with a fixed
+preamble. A RAM prompt cache is also attached when llama_cpp provides one, so
+that prefix survives requests that have other prompts between them.
+"""
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio, threading, time
+from collections import deque
+
+
+_DONE = object()
+
+
+class LLMJob:
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.tokens: asyncio.Queue = asyncio.Queue()
+        self.cancelled = threading.Event()
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+
+
+class LLMScheduler:
+    def __init__(self, get_llm: Callable[[], Awaitable], max_queue: int = 8, prompt_cache_bytes: int = 2 << 30):
+        self._get_llm = get_llm               # async, e.g. lambda: components.get("llm")
+        self.max_queue = max_queue
+        self.prompt_cache_bytes = prompt_cache_bytes
+        self._queue: "deque[LLMJob]" = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.running: Optional[LLMJob] = None
+        self.stats = {
+            "submitted": 0, "rejected": 0, "started": 0, "completed": 0, "cancelled": 0, "failed": 0,
+            "queue_wait_sum": 0.0, "queue_wait_max": 0.0, "ttft_sum": 0.0, "ttft_count": 0,
+            "tokens": 0, "generate_seconds": 0.0
+        }
+
+    # ---------- admission ----------
+    def ensure_capacity(self) -> None:
+        """Raise asyncio.QueueFull if ``submit`` would be refused right now, so
+        callers can turn requests away before building the prompt."""
+        if len(self._queue) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise asyncio.QueueFull
+
+    def submit(self, prompt: str) -> LLMJob:
+        """Queue a prompt; raises asyncio.QueueFull when ``max_queue`` jobs are waiting."""
+        self.ensure_capacity()
+        job = LLMJob(prompt)
+        self._queue.append(job)
+        self.stats["submitted"] += 1
+        self._wakeup.set()
+        return job
+
+    async def stream(self, job: LLMJob) -> AsyncIterator[str]:
+        """Yield the job's tokens; stopping early (client disconnect) cancels it."""
+        finished = False
+        try:
+            while True:
+                item = await job.tokens.get()
+                if item is _DONE:
+                    finished = True
+                    return
+                if isinstance(item, Exception):
+                    finished = True
+                    raise item
+                if job.first_token_at is None:
+                    job.first_token_at = time.monotonic()
+                    self.stats["ttft_sum"] += job.first_token_at - job.enqueued_at
+                    self.stats["ttft_count"] += 1
+                yield item
+        finally:
+            if not finished:
+                job.cancelled.set()
+
+    # ---------- worker ----------
+    def _enable_prompt_cache(self, llm) -> None:
+        model = getattr(llm, "_model", None)
+        try:
+            from llama_cpp import LlamaRAMCache
+            model.set_cache(LlamaRAMCache(capacity_bytes=self.prompt_cache_bytes))
+        except (ImportError, AttributeError) as e:
+            print(f"LLM prompt cache not enabled: {e}")
+
+    def _generate(self, llm, job: LLMJob, loop: asyncio.AbstractEventLoop) -> None:
+        put = lambda item: loop.call_soon_threadsafe(job.tokens.put_nowait, item)
+        try:
+            for chunk in llm.stream_complete(job.prompt):
+                if job.cancelled.is_set():
+                    break  # closing the generator stops llama.cpp mid-sequence
+                if chunk.delta:
+                    self.stats["tokens"] += 1
+                    put(chunk.delta)
+        except Exception as e:
+            put(e)
+            raise
+        finally:
+            put(_DONE)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        llm = None
+
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            job = self._queue.popleft()
+            if job.cancelled.is_set():
+                self.stats["cancelled"] += 1
+                continue
+
+            if llm is None:
+                # first job waits for the model to finish loading
+                try:
+                    llm = await self._get_llm()
+                    self._enable_prompt_cache(llm)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    job.tokens.put_nowait(e)
+                    continue
+
+            job.started_at = time.monotonic()
+            self.stats["started"] += 1
+            wait = job.started_at - job.enqueued_at
+            self.stats["queue_wait_sum"] += wait
+            self.stats["queue_wait_max"] = max(self.stats["queue_wait_max"], wait)
+
+            self.running = job
+            try:
+                await asyncio.to_thread(self._generate, llm, job, loop)
+                self.stats["cancelled" if job.cancelled.is_set() else "completed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"LLM generation failed: {e}")
+            finally:
+                self.stats["generate_seconds"] += time.monotonic() - job.started_at
+                self.running = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for job in self._queue:
+            job.cancelled.set()
+            job.tokens.put_nowait(_DONE)
+        self._queue.clear()
+        if self.running is not None:
+            self.running.cancelled.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    # ---------- metrics ----------
+    def metrics(self) -> Dict[str, float]:
+        started = self.stats["started"]
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "busy": self.running is not None,
+            "submitted": self.stats["submitted"],
+            "rejected": self.stats["rejected"],
+            "admission_rate": (self.stats["submitted"] / (self.stats["submitted"] + self.stats["rejected"])
+                               if self.stats["submitted"] else 0.0),
+            "completed": self.stats["completed"],
+            "cancelled": self.stats["cancelled"],
+            "failed": self.stats["failed"],
+            "queue_wait_avg": self.stats["queue_wait_sum"] / started if started else 0.0,
+            "queue_wait_max": self.stats["queue_wait_max"],
+            "ttft_avg": self.stats["ttft_sum"] / self.stats["ttft_count"] if self.stats["ttft_count"] else 0.0,
+            "tokens_per_second": (self.stats["tokens"] / self.stats["generate_seconds"]
+                                  if self.stats["generate_seconds"] else 0.0),
+        }
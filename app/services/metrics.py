@@ -0,0 +1,91 @@
+"""
+Prometheus metrics served at /metrics.
+
+All collectors live in ``registry`` (set as ``app.state.registry`` so the
+aioprometheus handler renders it). MetricsMiddleware records every HTTP
+request by route template, method and status; ``timed(stage)`` records
+internal stages (CIK lookup, metadata fetch, download, parse, chunking,
+embedding, retrieval, news fetch) in one histogram labelled by stage and
+result, e.g. ``{"stage": "download", "result": "hit"}``.
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import time
+from aioprometheus import Counter, Gauge, Histogram, Registry
+from starlette.routing import Match
+
+
+registry = Registry()
+
+# SEC analyses and streamed answers run for minutes, so the buckets go well past 2 s
+REQUEST_BUCKETS = [.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800]
+STAGE_BUCKETS = [.0001, .0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+REQUESTS = Counter("req_total", "HTTP requests by route template, method and status", registry=registry)
+LATENCY = Histogram("req_latency", "HTTP request latency in seconds (until the response body is sent)",
+                    buckets=REQUEST_BUCKETS, registry=registry)
+IN_FLIGHT = Gauge("req_in_flight", "HTTP requests currently being served", registry=registry)
+STAGE_SECONDS = Histogram("stage_seconds", "Time spent in internal pipeline stages",
+                          buckets=STAGE_BUCKETS, registry=registry)
+
+
+@contextmanager
+def timed(stage: str, result: str = "ok") -> Iterator[Dict[str, str]]:
+    """Time a block; set ``labels["result"]`` inside it to classify the outcome.
+
+    Blocks that raise are recorded with result="error".
+    """
+    labels = {"stage": stage, "result": result}
+    started = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels["result"] = "error"
+        raise
+    finally:
+        STAGE_SECONDS.observe(labels, time.perf_counter() - started)
+
+
+def route_template(scope) -> str:
+    """Path template ("/api/jobs/{job_id}") of the route serving ``scope``.
+
+    Unmatched paths share one label so scanners can't blow up the series count.
+    """
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path  # path matches, method doesn't (405)
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = route_template(scope)
+        method = scope["method"]
+        status_code = 500  # the app raised before starting a response
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc({"route": route, "method": method})
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            labels = {"route": route, "method": method, "status": str(status_code)}
+            IN_FLIGHT.dec({"route": route, "method": method})
+            REQUESTS.inc(labels)
+            LATENCY.observe(labels, time.perf_counter() - started)
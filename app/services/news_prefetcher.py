@@ -0,0 +1,82 @@
+"""
+Background refresh of the most requested NewsService symbols.
+
+Every cycle the top-N symbols by (decayed) request count are refreshed when
+their cache entry is missing or within ``refresh_margin`` seconds of expiry,
+so hot symbols are already warm when users ask. Refreshes are paced by a
+global rate limit with random jitter so they never fire in lockstep.
+"""
+from typing import Optional
+import asyncio, random
+from .news_service import NewsService
+
+
+class NewsPrefetcher:
+    def __init__(
+        self,
+        service: NewsService,
+        top_n: int = 50,
+        interval: float = 30,
+        refresh_margin: float = 60,
+        max_rate: float = 2.0,
+        jitter: float = 0.25,
+        decay: float = 0.9
+    ):
+        self.service = service
+        self.top_n = top_n
+        self.interval = interval              # seconds between scans
+        self.refresh_margin = refresh_margin  # refresh this long before expiry
+        self.max_rate = max_rate              # upstream fetches per second, global
+        self.jitter = jitter                  # +/- fraction applied to every wait
+        self.decay = decay                    # demand multiplier per cycle
+        self.prefetches = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def _jittered(self, seconds: float) -> float:
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _due(self, symbol: str) -> bool:
+        age = self.service.entry_age(symbol)
+        return age is None or age >= self.service.cache_duration - self.refresh_margin
+
+    async def run_once(self) -> int:
+        refreshed = 0
+        for symbol in self.service.hot_symbols(self.top_n):
+            if not self._due(symbol):
+                continue
+            await self.service._refresh(symbol, prefetched=True)
+            refreshed += 1
+            await asyncio.sleep(self._jittered(1 / self.max_rate))
+
+        # old popularity fades so yesterday's movers drop out of the top-N
+        for symbol in list(self.service.demand):
+            self.service.demand[symbol] *= self.decay
+            if self.service.demand[symbol] < 0.5:
+                del self.service.demand[symbol]
+
+        self.prefetches += refreshed
+        return refreshed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._jittered(self.interval))
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"News prefetch cycle failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {**self.service.metrics(), "prefetches": self.prefetches}
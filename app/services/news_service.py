@@ -2,21 +2,125 @@ import feedparser
 import time
 import json
 import os
+import asyncio
+import httpx
+from collections import Counter, OrderedDict
 from typing import List, Dict, Any, Optional
 import re
+import hashlib
+from email.utils import parsedate_to_datetime
 from urllib.parse import quote
+from .metrics import timed
+
+
+# compiled once per process, shared by every feed entry
+_IMG_RE = re.compile(r'<img[^>]+src="([^">]+)"')
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+
+
+def _published_ts(item: Dict) -> float:
+    try:
+        return parsedate_to_datetime(item.get("published", "")).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
 
 class NewsService:
-    def __init__(self):
+    def __init__(self, max_entries: int = 512, cache_duration: int = 300, stale_duration: int = 3600):
         self.google_url = "https://news.google.com/rss/search?q={query}+stock&hl=en-US&gl=US&ceid=US:en"
         self.sample_data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
         
-        self.cache = {}
-        self.cache_time = {}
-        self.cache_duration = 300  # valid cache duration
-    
+        # symbol -> (fetched_at, news_items, prefetched), least recently used first
+        self.cache: "OrderedDict[str, tuple[float, List[Dict], bool]]" = OrderedDict()
+        self.max_entries = max_entries
+        self.cache_duration = cache_duration  # valid cache duration
+        self.stale_duration = stale_duration  # served while a refresh runs in the background
+        self.max_items = 20                   # largest `limit` the API accepts
+
+        self._client: httpx.AsyncClient | None = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # request frequency per symbol (decayed by NewsPrefetcher) and serving stats
+        self.demand: Counter = Counter()
+        self.stats = {"requests": 0, "cache_hits": 0, "prefetch_hits": 0, "served_age_sum": 0.0, "served_age_max": 0.0}
     
-    def get_stock_news(self, symbol: str, limit: int = 10) -> List[Dict[Any, Any]]:
+
+    async def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=10,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._client
+
+
+    async def aclose(self):
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+
+    def _cache_put(self, symbol: str, news_items: List[Dict], prefetched: bool = False):
+        self.cache[symbol] = (time.time(), news_items, prefetched)
+        self.cache.move_to_end(symbol)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+
+    async def _fetch(self, symbol: str, prefetched: bool = False) -> Optional[List[Dict]]:
+        # generate google rss news url
+        query = quote(symbol)
+        url = self.google_url.format(query=query)
+        
+        with timed("news_fetch") as stage:
+            try:
+                print(f"Fetching news for {symbol} from {url}")
+                client = await self._ensure_client()
+                response = await client.get(url)
+                response.raise_for_status()
+
+                # RSS feed parsing is CPU work, keep it off the event loop
+                feed = await asyncio.to_thread(feedparser.parse, response.content)
+
+                if not feed.entries:
+                    print("No entries found in feed")
+                    stage["result"] = "empty"
+                    return None
+            
+                news_items = []
+                for entry in feed.entries[:self.max_items]:
+                    item = {
+                        "title": entry.title,
+                        "link": entry.link,
+                        "published": entry.published,
+                        "source": self._extract_source(entry),
+                        "image_url": self._extract_image(entry),
+                        "summary": self._clean_summary(entry.get("summary", ""))
+                    }
+                    news_items.append(item)
+            
+                # update cache
+                self._cache_put(symbol, news_items, prefetched)
+                return news_items
+        
+            except Exception as e:
+                print(f"Error fetching news for {symbol}: {str(e)}")
+                stage["result"] = "error"
+                return None
+
+
+    def _refresh(self, symbol: str, prefetched: bool = False) -> asyncio.Future:
+        """Single-flight: concurrent misses for a symbol share one upstream request."""
+        fut = self._inflight.get(symbol)
+        if fut is None:
+            fut = asyncio.ensure_future(self._fetch(symbol, prefetched))
+            self._inflight[symbol] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(symbol, None))
+        return fut
+
+
+    async def get_stock_news(self, symbol: str, limit: int = 10) -> List[Dict[Any, Any]]:
         """
         News regarding the stock symbol
         
@@ -27,49 +131,109 @@ class NewsService:
         Returns:
             List[Dict] of News (제목, 링크, 출처, 게시일, 이미지 URL 등 포함)
         """
+        self.demand[symbol] += 1
+        self.stats["requests"] += 1
+
         # check cache
-        current_time = time.time()
-        if symbol in self.cache and (current_time - self.cache_time.get(symbol, 0)) < self.cache_duration:
-            return self.cache[symbol][:limit]
-        
-        # generate google rss news url
-        query = quote(symbol)
-        url = self.google_url.format(query=query)
-        
-        try:
-            # RSS feed parsing
-            print(f"Fetching news for {symbol} from {url}")
-            feed = feedparser.parse(url)
-            
-            # debugging
-            #print(f"Feed status: {feed.get('status', 'unknown')}")
-            #print(f"Feed entries count: {len(feed.entries) if hasattr(feed, 'entries') else 0}")
-            
-            if not feed.entries:
-                print("No entries found in feed")
+        with timed("news_lookup", "fresh") as stage:
+            entry = self.cache.get(symbol)
+            if entry is not None:
+                fetched_at, news_items, prefetched = entry
+                age = time.time() - fetched_at
+                if age < self.stale_duration:
+                    if age >= self.cache_duration:
+                        # stale-while-revalidate: answer now, refresh in the background
+                        self._refresh(symbol)
+                        stage["result"] = "stale"
+                    self.cache.move_to_end(symbol)
+                    self._record_hit(age, prefetched)
+                    return news_items[:limit]
+
+            stage["result"] = "miss"
+            news_items = await asyncio.shield(self._refresh(symbol))
+            if news_items is None:
+                stage["result"] = "fallback"
                 return self._get_sample_news(symbol, limit)  # 대체 데이터 반환
-            
-            news_items = []
-            for entry in feed.entries[:limit]:
-                item = {
-                    "title": entry.title,
-                    "link": entry.link,
-                    "published": entry.published,
-                    "source": self._extract_source(entry),
-                    "image_url": self._extract_image(entry),
-                    "summary": self._clean_summary(entry.get("summary", ""))
-                }
-                news_items.append(item)
-            
-            # update cache
-            self.cache[symbol] = news_items
-            self.cache_time[symbol] = current_time
-            
-            return news_items
-        
-        except Exception as e:
-            print(f"Error fetching news for {symbol}: {str(e)}")
-            return self._get_sample_news(symbol, limit)
+            return news_items[:limit]
+
+
+    def _record_hit(self, age: float, prefetched: bool):
+        self.stats["cache_hits"] += 1
+        self.stats["prefetch_hits"] += prefetched
+        self.stats["served_age_sum"] += age
+        self.stats["served_age_max"] = max(self.stats["served_age_max"], age)
+
+
+    def hot_symbols(self, n: int) -> List[str]:
+        return [symbol for symbol, _ in self.demand.most_common(n)]
+
+
+    def entry_age(self, symbol: str) -> Optional[float]:
+        entry = self.cache.get(symbol)
+        return None if entry is None else time.time() - entry[0]
+
+
+    def metrics(self) -> Dict[str, float]:
+        requests = self.stats["requests"]
+        hits = self.stats["cache_hits"]
+        return {
+            "requests": requests,
+            "cache_hit_rate": hits / requests if requests else 0.0,
+            "prefetch_hit_rate": self.stats["prefetch_hits"] / requests if requests else 0.0,
+            "served_age_avg": self.stats["served_age_sum"] / hits if hits else 0.0,
+            "served_age_max": self.stats["served_age_max"],
+            "cached_symbols": len(self.cache),
+        }
+
+
+    async def get_many_stock_news(self, symbols: List[str], limit: int = 10, concurrency: int = 10) -> Dict[str, Any]:
+        """
+        News for several symbols at once.
+
+        Returns per-symbol lists plus one merged feed, newest first, where an
+        article listed under several symbols (same link or same title)
+        appears once with all of its tickers.
+        """
+        sem = asyncio.Semaphore(concurrency)
+        symbols = list(dict.fromkeys(symbols))
+
+        async def one(symbol: str) -> List[Dict]:
+            async with sem:
+                return await self.get_stock_news(symbol, limit)
+
+        results = await asyncio.gather(*(one(sym) for sym in symbols))
+        per_symbol = dict(zip(symbols, results))
+
+        merged = []
+        seen: Dict[str, Dict] = {}
+        for symbol, news_items in per_symbol.items():
+            for item in news_items:
+                keys = [
+                    hashlib.sha1(item.get("link", "").encode()).hexdigest(),
+                    hashlib.sha1(item.get("title", "").strip().lower().encode()).hexdigest()
+                ]
+                existing = next((seen[k] for k in keys if k in seen), None)
+                if existing is not None:
+                    if symbol not in existing["tickers"]:
+                        existing["tickers"].append(symbol)
+                    continue
+                merged_item = {**item, "tickers": [symbol]}  # cached dicts stay untouched
+                for k in keys:
+                    seen[k] = merged_item
+                merged.append(merged_item)
+
+        merged.sort(key=_published_ts, reverse=True)
+        return {"symbols": per_symbol, "merged": merged}
+
+
+    def _get_sample_news(self, symbol: str, limit: int) -> List[Dict[Any, Any]]:
+        """Fallback news from app/data/sample_news.json, if present."""
+        path = os.path.join(self.sample_data_dir, "sample_news.json")
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            sample = json.load(f)
+        return sample.get(symbol, sample.get("default", []))[:limit]
         
     
     def _extract_source(self, entry: Dict) -> str:
@@ -93,7 +257,7 @@ class NewsService:
                     return media["url"]
         
         if "summary" in entry:
-            img_match = re.search(r'<img[^>]+src="([^">]+)"', entry.summary)
+            img_match = _IMG_RE.search(entry.summary)
             if img_match:
                 return img_match.group(1)
         
@@ -103,9 +267,9 @@ class NewsService:
     def _clean_summary(self, summary: str) -> str:
         """Remove html tags and return summary."""
         # HTML 태그 제거
-        clean_text = re.sub(r'<[^>]+>', '', summary)
+        clean_text = _TAG_RE.sub('', summary)
         # 여러 공백 제거
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+        clean_text = _WS_RE.sub(' ', clean_text).strip()
         # 길이 제한
         if len(clean_text) > 200:
             clean_text = clean_text[:197] + "..."
@@ -0,0 +1,163 @@
+"""
+Query-result cache in front of the vector retrievers.
+
+Results are cached per collection. A lookup first tries the normalized query
+text (no embedding call at all), then embeds the query (CachedEmbedding keeps
+exact query vectors on disk) and serves the closest earlier query of the same
+collection if its cosine similarity is at least ``threshold``. Only misses
+reach Chroma, and they reuse the query vector that was just computed.
+Entries are LRU-evicted, expire after ``ttl`` seconds, and are dropped per
+collection by ``invalidate`` whenever chunks are ingested. ``invalidate`` also
+bumps the collection's generation: a miss that was already searching when it
+ran passes the generation it started with to ``put`` and is not cached.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import asyncio, re, threading, time
+import numpy as np
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from app.services.metrics import timed
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _WS_RE.sub(" ", query).strip().lower()
+
+
+class RetrievalCache:
+    def __init__(self, max_entries: int = 2048, threshold: float = 0.95, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        # (collection, normalized query) -> (stored_at, unit vector, k, nodes)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations: Dict[str, int] = {}
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0, "evictions": 0,
+                      "stale_puts": 0}
+
+    def _live(self, entry: tuple, k: int) -> bool:
+        stored_at, _, entry_k, _ = entry
+        return entry_k >= k and time.monotonic() - stored_at < self.ttl
+
+    def get_exact(self, collection: str, query: str, k: int) -> Optional[List[NodeWithScore]]:
+        key = (collection, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._live(entry, k):
+                return None
+            self._entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return entry[3][:k]
+
+    def get_similar(self, collection: str, embedding: List[float], k: int) -> Optional[List[NodeWithScore]]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec /= np.linalg.norm(vec) or 1.0
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if key[0] == collection and self._live(entry, k)]
+            if keys:
+                sims = np.stack([self._entries[key][1] for key in keys]) @ vec
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.stats["semantic_hits"] += 1
+                    return self._entries[keys[best]][3][:k]
+            self.stats["misses"] += 1
+            return None
+
+    def generation(self, collection: str) -> int:
+        """Take this before searching and hand it to ``put``."""
+        with self._lock:
+            return self._generations.get(collection, 0)
+
+    def put(self, collection: str, query: str, embedding: List[float], k: int, nodes: List[NodeWithScore],
+            generation: Optional[int] = None) -> None:
+        """Cache ``nodes`` unless ``collection`` was invalidated since ``generation``."""
+        vec = np.asarray(embedding, dtype=np.float32)
+        vec /= np.linalg.norm(vec) or 1.0
+        with self._lock:
+            if generation is not None and generation != self._generations.get(collection, 0):
+                # searched before an ingest finished: may miss (or still hold) its chunks
+                self.stats["stale_puts"] += 1
+                return
+            key = (collection, normalize_query(query))
+            self._entries[key] = (time.monotonic(), vec, k, nodes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, collection: str) -> int:
+        """Drop every cached result of one collection (call after ingesting into it)."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == collection]
+            for key in stale:
+                del self._entries[key]
+            self._generations[collection] = self._generations.get(collection, 0) + 1
+            self.stats["invalidations"] += 1
+        return len(stale)
+
+    def metrics(self) -> Dict[str, float]:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+retrieval_cache = RetrievalCache()
+
+
+class CachedRetriever(BaseRetriever):
+    """Drop-in replacement for a VectorIndexRetriever over ``collection``."""
+
+    def __init__(self, inner, collection: str, k: int, cache: RetrievalCache = None):
+        super().__init__()
+        self._inner = inner
+        self._embed_model = inner._embed_model
+        self.collection = collection
+        self.k = k
+        self.cache = cache or retrieval_cache
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query = query_bundle.query_str
+        with timed("retrieval", "exact_hit") as stage:
+            nodes = self.cache.get_exact(self.collection, query, self.k)
+            if nodes is not None:
+                return nodes
+
+            embedding = query_bundle.embedding or self._embed_model.get_query_embedding(query)
+            stage["result"] = "semantic_hit"
+            nodes = self.cache.get_similar(self.collection, embedding, self.k)
+            if nodes is not None:
+                return nodes
+
+            stage["result"] = "miss"
+            generation = self.cache.generation(self.collection)
+            nodes = self._inner.retrieve(QueryBundle(query_str=query, embedding=embedding))
+            self.cache.put(self.collection, query, embedding, self.k, nodes, generation)
+            return nodes
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        query = query_bundle.query_str
+        with timed("retrieval", "exact_hit") as stage:
+            nodes = self.cache.get_exact(self.collection, query, self.k)
+            if nodes is not None:
+                return nodes
+
+            embedding = query_bundle.embedding or await self._embed_model.aget_query_embedding(query)
+            stage["result"] = "semantic_hit"
+            nodes = await asyncio.to_thread(self.cache.get_similar, self.collection, embedding, self.k)
+            if nodes is not None:
+                return nodes
+
+            stage["result"] = "miss"
+            generation = self.cache.generation(self.collection)
+            nodes = await self._inner.aretrieve(QueryBundle(query_str=query, embedding=embedding))
+            self.cache.put(self.collection, query, embedding, self.k, nodes, generation)
+            return nodes
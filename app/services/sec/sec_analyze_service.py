@@ -1,22 +1,58 @@
 from app.config import settings
 import pandas as pd
-import requests
+import numpy as np
 from tqdm import tqdm
-from bs4 import BeautifulSoup
-import regex as re
 from llama_index.core.node_parser import TokenTextSplitter
 from llama_index.core import VectorStoreIndex
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.core import Document
 from .sec_url import find_cik, SECFilingClient
+from .sec_html_parser import parse_columns, parse_file, parse_pool, bs4_table_title
+from .sec_downloader import SecDownloader
+from .sec_ratelimit import bulk_priority
+from .sec_pipeline import run_pipeline
+from .sec_embedder import SecEmbedder
+from .sec_tables import write_tables
+from app.services.metrics import timed
 import asyncio
 
 
 headers = settings.headers
 
+# Compact frame schema: repeated metadata as categoricals, counters as int32,
+# free text in Arrow string buffers (one contiguous buffer per chunk instead of
+# one Python str object per row).
+CATEGORY_COLUMNS = ["company_name", "form_type", "date", "table_title", "accession"]
+INT32_COLUMNS = [
+    "page_number", "page_char_count", "page_word_count", "page_sentence_count_raw", "page_token_count",
+    "chunk_char_count", "chunk_word_count", "chunk_sentence_count_raw", "chunk_token_count",
+    "table_number", "row", "column"
+]
+TEXT_COLUMNS = ["content", "content_chunk", "data"]
+
+# Measured with the compact schema: ~30 bytes per table cell plus its text, and
+# ~30 bytes per page/chunk plus its text. A 10-K (~30k cells, ~100 pages, ~300
+# chunks) is ~3 MB, a 10-Q about a third of that, 8-Ks are far smaller, so the
+# default fetch (top 5 per form) stays well below this per-company budget.
+MEMORY_BUDGET_PER_COMPANY = 64 * 1024 ** 2
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    dtypes = {}
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            dtypes[col] = "category"
+        elif col in INT32_COLUMNS:
+            dtypes[col] = "int32"
+        elif col in TEXT_COLUMNS:
+            dtypes[col] = "string[pyarrow]"
+    return df.astype(dtypes)
+
 
 class SECAnalyzingClient(SECFilingClient):
-    def __init__(self, ticker: str, embedding):
+    def __init__(self, ticker: str, embedding, html_parser: str = None, parse_workers: int = None, downloader: SecDownloader = None, embedder: SecEmbedder = None):
         cik, success = find_cik(ticker)
         if not success:
             raise ValueError(cik)
@@ -28,6 +64,12 @@ class SECAnalyzingClient(SECFilingClient):
         self.text_df = pd.DataFrame()
         self.table_df = pd.DataFrame()
         self.embedding = embedding
+        self.html_parser = html_parser  # None -> DEFAULT_PARSER ("html.parser"), "lxml" is faster
+        self.parse_workers = settings.SEC_PARSE_WORKERS if parse_workers is None else parse_workers
+        self.downloader = downloader
+        self.embedder = embedder    # persistent per-CIK store; None keeps an in-memory index
+        self.ingest_report = {}
+        self.progress = {}          # per-stage filing counts of the running parse_filings
         
     
     def fill_filings(self):
@@ -40,6 +82,7 @@ class SECAnalyzingClient(SECFilingClient):
                 "index": i,
                 "form": form,
                 "report_date": date,
+                "accession": acc_no,
                 "url": f"https://www.sec.gov/Archives/edgar/data/{self.cik}/{acc_no}/{doc}"
             })
 
@@ -48,98 +91,46 @@ class SECAnalyzingClient(SECFilingClient):
         return text.replace("\n", " ").strip()
 
     def find_table_title(self, table):
-        parent_div = table.find_parent("div")
-        if parent_div:
-            prev_div = parent_div.find_previous_sibling("div")
-            if prev_div:
-                title_text = prev_div.get_text(strip=True)
-                if title_text:
-                    return title_text
-                else:
-                    prev_div = prev_div.find_previous_sibling("div")
-                if prev_div:
-                    return prev_div.get_text(strip=True)
-        return "No Title Found"
-
-    async def clean_data(self, html: str, company_name: str, form_type: str, report_date: str, chunk_size=512, chunk_overlap=50) -> pd.DataFrame:
-        soup = BeautifulSoup(html, "html.parser")
-        tables = soup.find_all("table")
-
-        structured_tables = []
-
-        for i, table in enumerate(tables):
-            table_title = self.find_table_title(table)
-
-            for x, tr in enumerate(table.find_all("tr")):
-                for y, data in enumerate(tr.find_all("td")):
-                    structured_tables.append({
-                        "company_name": company_name,
-                        "form_type": form_type,
-                        "date": report_date,
-                        "table_number": i,
-                        "table_title": table_title,
-                        "row": x,
-                        "column": y,
-                        "data": data.get_text(strip=True)
-                    })
-
-
-        for table in tables:
-            for tr in table.find_all("tr"):
-                for data in tr.find_all("td"):
-                    data.decompose()
-
-        pages_and_texts = []
-        page_number = 0
-        current_page = []
-        text_cleaning_tasks = []
-
-        for element in soup.body.children:
-            if element.name == "hr":
-                if text_cleaning_tasks:  # Ensure we have tasks to process
-                    texts_list = await asyncio.gather(*text_cleaning_tasks)
-                    texts = " ".join(texts_list).strip()
-                    if texts:  # Ensure texts are not empty
-                        pages_and_texts.append({
-                            "company_name": company_name,
-                            "form_type": form_type,
-                            "date": report_date,
-                            "page_number": page_number,
-                            "page_char_count": len(texts),
-                            "page_word_count": len(texts.split()),
-                            "page_sentence_count_raw": len(texts.split(". ")),
-                            "page_token_count": len(texts) / 4,
-                            "content": re.sub(r"\s*\d+\s*$", "", texts.strip())
-                        })
-                        page_number += 1
-
-                # Reset lists after an HR tag
-                current_page = []
-                text_cleaning_tasks = []
+        return bs4_table_title(table)
 
-            else:
-                text_content = element.get_text(" ", strip=True)
-                if text_content.strip():  # Only process non-empty text
-                    text_cleaning_tasks.append(asyncio.create_task(self.clean_text(text_content)))
-                    current_page.append(text_content)  # Ensure text is tracked
-
-        # Add the last page if there's remaining content
-        if current_page:
-            texts = " ".join(await asyncio.gather(*text_cleaning_tasks)).strip()
-            pages_and_texts.append({
+    async def clean_data(self, html: str, company_name: str, form_type: str, report_date: str, chunk_size=512, chunk_overlap=50, parser: str = None, accession: str = None) -> pd.DataFrame:
+        parsed = parse_columns(html, parser or self.html_parser)
+        return await self.build_frames(parsed, company_name, form_type, report_date, chunk_size, chunk_overlap, accession)
+
+    async def build_frames(self, parsed: dict, company_name: str, form_type: str, report_date: str, chunk_size=512, chunk_overlap=50, accession: str = None) -> pd.DataFrame:
+        """Turn parse_columns output into (chunk_text_df, text_df, table_df).
+
+        ``accession`` is added as a column of chunk_text_df so SecEmbedder can
+        ingest filings incrementally, and of table_df to key the table store.
+        """
+        if len(parsed["data"]):
+            table_df = pd.DataFrame({
                 "company_name": company_name,
                 "form_type": form_type,
                 "date": report_date,
-                "page_number": page_number,
-                "page_char_count": len(texts),
-                "page_word_count": len(texts.split()),
-                "page_sentence_count_raw": len(texts.split(". ")),
-                "page_token_count": len(texts) / 4,
-                "content": re.sub(r"\s*\d+\s*$", "", texts.strip())
+                "table_number": parsed["table_number"].astype("int64"),
+                "table_title": parsed["table_title"],
+                "row": parsed["row"].astype("int64"),
+                "column": parsed["column"].astype("int64"),
+                "data": parsed["data"],
+                "accession": accession or ""
             })
-
-        text_df = pd.DataFrame(pages_and_texts)
-        table_df = pd.DataFrame(structured_tables)
+        else:
+            table_df = pd.DataFrame()
+
+        pages = pd.Series(parsed["pages"], dtype=object)
+        page_chars = pages.str.len()
+        text_df = pd.DataFrame({
+            "company_name": company_name,
+            "form_type": form_type,
+            "date": report_date,
+            "page_number": np.arange(len(pages)),
+            "page_char_count": page_chars,
+            "page_word_count": pages.str.count(r"\S+"),
+            "page_sentence_count_raw": pages.str.count(r"\. ") + 1,
+            "page_token_count": page_chars // 4,
+            "content": pages.str.strip().str.replace(r"\s*\d+\s*$", "", regex=True)
+        })
 
         text_df = text_df.iloc[1:].reset_index(drop=True)
         text_df["content"] = text_df["content"].replace("", None)
@@ -148,72 +139,216 @@ class SECAnalyzingClient(SECFilingClient):
 
         splitter = TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
-        split_content = []
-        chunk_processing_tasks = []
-
-        for _, row in text_df.iterrows():
-            chunk_processing_tasks.append(asyncio.to_thread(splitter.split_text, row["content"]))
-
-        chunk_results = await asyncio.gather(*chunk_processing_tasks)
-
-        for row, chunks in zip(text_df.iterrows(), chunk_results):
-            for chunk in chunks:
-                split_content.append({
-                    "company_name": company_name,
-                    "form_type": form_type,
-                    "date": report_date,
-                    "page_number": row[1]["page_number"],
-                    "chunk_char_count": len(chunk),
-                    "chunk_word_count": len(chunk.split()),
-                    "chunk_sentence_count_raw": len(chunk.split(". ")),
-                    "chunk_token_count": len(chunk) / 4,
-                    "content_chunk": chunk
-                })
-
-        chunk_text_df = pd.DataFrame(split_content)
-
-        return chunk_text_df, text_df, table_df
-
-
-    async def parse_filings(self):
-        chunk_text = []
-        text = []
-        table = []
-        response = []
-
-        for file in tqdm(self.filings, desc='fetching response from url'):
-            data = requests.get(file['url'], headers=headers)
-            response.append(data.text)
-
-        for file, html in tqdm(zip(self.filings, response), desc='preprocessing data', total=len(self.filings)):
-            chunk_df, t_df, tab_df = await self.clean_data(html, self.ticker, file['form'], file['report_date'])
-            chunk_text.append(chunk_df)
-            text.append(t_df)
-            table.append(tab_df)
-
-        self.chunk_text_df = pd.concat(chunk_text)
-        self.text_df = pd.concat(text)
-        self.table_df = pd.concat(table)
-
-        documents = []
-
-        for _, row in self.chunk_text_df.iterrows():
-            content = row["content_chunk"]
-            metadata = {
-                "company_name": row.get("company_name", ""),
-                "form_type": row.get("form_type", ""),
-                "date": row.get("date", ""),
-                "page_number": row.get("page_number", 0),
-                "chunk_word_count": row.get("chunk_word_count", 0),
-                "chunk_token_count": row.get("chunk_token_count", 0)
+        # one worker thread per filing instead of one task per page
+        chunk_results = await asyncio.to_thread(
+            lambda texts: [splitter.split_text(t) for t in texts], text_df["content"].tolist()
+        )
+        chunks = pd.Series([c for page in chunk_results for c in page], dtype=object)
+        chunk_chars = chunks.str.len()
+
+        split_content = {
+            "company_name": company_name,
+            "form_type": form_type,
+            "date": report_date,
+            "page_number": np.repeat(text_df["page_number"].to_numpy(), [len(page) for page in chunk_results]),
+            "chunk_char_count": chunk_chars,
+            "chunk_word_count": chunks.str.count(r"\S+"),
+            "chunk_sentence_count_raw": chunks.str.count(r"\. ") + 1,
+            "chunk_token_count": chunk_chars // 4,
+            "content_chunk": chunks
+        }
+
+        chunk_text_df = pd.DataFrame(split_content) if len(chunks) else pd.DataFrame()
+        if accession is not None and not chunk_text_df.empty:
+            chunk_text_df["accession"] = accession
+
+        return compact_frame(chunk_text_df), compact_frame(text_df), compact_frame(table_df)
+
+
+    def _documents(self, chunk_df: pd.DataFrame) -> list:
+        if chunk_df.empty:
+            return []
+
+        def column(name, default):
+            return chunk_df[name].tolist() if name in chunk_df.columns else [default] * len(chunk_df)
+
+        return [
+            Document(text=content, metadata={
+                "company_name": company_name,
+                "form_type": form_type,
+                "date": date,
+                "page_number": page_number,
+                "chunk_word_count": word_count,
+                "chunk_token_count": token_count
+            })
+            for content, company_name, form_type, date, page_number, word_count, token_count in zip(
+                chunk_df["content_chunk"].tolist(),
+                column("company_name", ""),
+                column("form_type", ""),
+                column("date", ""),
+                column("page_number", 0),
+                column("chunk_word_count", 0),
+                column("chunk_token_count", 0)
+            )
+        ]
+
+
+    async def parse_filings(
+        self,
+        downloader: SecDownloader = None,
+        queue_depth: int = 4,
+        download_concurrency: int = 4,
+        parse_concurrency: int = 2,
+        chunk_concurrency: int = 2,
+        embed_concurrency: int = 1,
+        keep_frames: bool = True,
+        refresh: bool = False,
+        save_tables: bool = True
+    ):
+        """Download -> parse -> chunk -> embed, one filing at a time per stage.
+
+        Filing N is embedded while N+1 is parsed and N+2 downloaded; at most
+        ``queue_depth`` filings wait between two stages. With ``keep_frames``
+        False the per-filing DataFrames are dropped once embedded, so memory no
+        longer grows with the number of filings.
+
+        With an ``embedder`` the persistent ``sec_{cik}`` collection is used:
+        filings already stored there are not downloaded again (unless
+        ``refresh``), new ones are ingested, and the retriever comes from the
+        embedder's warm index cache. Frames then only cover the new filings.
+
+        With ``save_tables`` each filing's table_df is also written to the
+        Parquet table store (see sec_tables.query_tables).
+        """
+        own_downloader = downloader is None and self.downloader is None
+        downloader = downloader or self.downloader or SecDownloader()
+        loop = asyncio.get_running_loop()
+
+        filings = self.filings
+        self.ingest_report = {"new": 0, "skipped": 0, "updated": 0, "deleted": 0, "filings_skipped": 0}
+        if self.embedder is not None:
+            if not refresh:
+                filings = [
+                    f for f in self.filings
+                    if not (f.get('accession') and self.embedder.has_accession(self.cik, f['accession']))
+                ]
+                self.ingest_report["filings_skipped"] = len(self.filings) - len(filings)
+        else:
+            self.vector_index = VectorStoreIndex([], embed_model=self.embedding)
+        self.progress = {"total": len(filings), "fetched": 0, "parsed": 0, "chunked": 0, "embedded": 0}
+        insert_lock = asyncio.Lock()
+        frames = []
+        progress = tqdm(total=len(filings), desc='processing filings')
+
+        async def fetch(file):
+            # ingestion is bulk traffic: interactive SEC requests go first
+            with bulk_priority():
+                path = await downloader.download(file['url'])
+            self.progress["fetched"] += 1
+            return file, path
+
+        async def parse(item):
+            file, path = item
+            with timed("html_parse"):
+                if self.parse_workers > 0:
+                    parsed = await loop.run_in_executor(parse_pool(self.parse_workers), parse_file, str(path), self.html_parser)
+                else:
+                    parsed = await asyncio.to_thread(parse_file, str(path), self.html_parser)
+            self.progress["parsed"] += 1
+            return file, parsed
+
+        async def chunk(item):
+            file, parsed = item
+            with timed("chunking"):
+                result = await self.build_frames(parsed, self.ticker, file['form'], file['report_date'], accession=file.get('accession'))
+            if save_tables:
+                await asyncio.to_thread(write_tables, result[2], self.ticker, self._filing_id(file))
+            self.progress["chunked"] += 1
+            return file, result
+
+        async def embed(item):
+            file, (chunk_df, t_df, tab_df) = item
+            if self.embedder is not None:
+                report = await asyncio.to_thread(
+                    self.embedder.ingest_dataframe, self.cik, chunk_df, refresh, file.get('accession')
+                )
+                for key, value in report.items():
+                    self.ingest_report[key] += value
+            else:
+                documents = self._documents(chunk_df)
+                with timed("embedding_batch"):
+                    embeddings = await asyncio.to_thread(
+                        self.embedding.get_text_embedding_batch, [doc.text for doc in documents]
+                    )
+                for doc, embedding in zip(documents, embeddings):
+                    doc.embedding = embedding
+                async with insert_lock:
+                    self.vector_index.insert_nodes(documents)
+            if keep_frames:
+                frames.append((file['index'], chunk_df, t_df, tab_df))
+            self.progress["embedded"] += 1
+            progress.update(1)
+
+        try:
+            await run_pipeline(filings, [
+                ("download", fetch, download_concurrency),
+                ("parse", parse, parse_concurrency),
+                ("chunk", chunk, chunk_concurrency),
+                ("embed", embed, embed_concurrency),
+            ], queue_depth=queue_depth)
+        finally:
+            progress.close()
+            if own_downloader:
+                await downloader.aclose()
+
+        if frames:
+            frames.sort(key=lambda f: f[0])
+            # categories differ per filing, so concat falls back to object; re-compact
+            self.chunk_text_df = compact_frame(pd.concat([f[1] for f in frames]))
+            self.text_df = compact_frame(pd.concat([f[2] for f in frames]))
+            self.table_df = compact_frame(pd.concat([f[3] for f in frames]))
+
+        if self.embedder is not None:
+            self.vector_index = self.embedder.index(self.cik)
+            self.retriver = self.embedder.retriever(self.cik, 20)
+        else:
+            self.retriver = VectorIndexRetriever(index=self.vector_index, similarity_top_k = 20)
+
+    
+    def _filing_id(self, file: dict) -> str:
+        """Accession of the filing; form_date only for filings listed without one."""
+        return file.get('accession') or f"{file['form']}_{file['report_date']}".replace(" ", "_")
+
+    def to_parquet(self) -> list:
+        """Write the current table_df to the Parquet table store, one file per filing."""
+        if self.table_df.empty:
+            return []
+        paths = []
+        keys = ["accession", "form_type", "date"]
+        for (accession, form, date), group in self.table_df.groupby(keys, sort=False, observed=True):
+            filing_id = self._filing_id({"accession": accession, "form": form, "report_date": date})
+            paths.append(write_tables(group, self.ticker, filing_id))
+        return paths
+
+
+    def memory_report(self) -> dict:
+        """Resident bytes of the analysis frames against MEMORY_BUDGET_PER_COMPANY."""
+        report = {}
+        for name in ("chunk_text_df", "text_df", "table_df"):
+            df = getattr(self, name)
+            usage = df.memory_usage(deep=True, index=True)
+            report[name] = {
+                "rows": len(df),
+                "bytes": int(usage.sum()),
+                "columns": {col: int(b) for col, b in usage.items()}
             }
-            doc = Document(text=content, metadata=metadata)
-            documents.append(doc)
+        total = sum(r["bytes"] for r in report.values())
+        report["total_bytes"] = total
+        report["budget_bytes"] = MEMORY_BUDGET_PER_COMPANY
+        report["within_budget"] = total <= MEMORY_BUDGET_PER_COMPANY
+        return report
 
-        self.vector_index = VectorStoreIndex(documents, embed_model=self.embedding)
-        self.retriver = VectorIndexRetriever(index=self.vector_index, similarity_top_k = 20)
 
-    
     def to_csv(self, path_for_chunk_text: str = None, path_for_text: str = None, path_table: str = None):
         if not path_for_chunk_text:
             self.chunk_text_df.to_csv(f"{path_for_chunk_text}")
@@ -1,21 +1,112 @@
 """
 As-a-service bulk downloader for SEC filings.
 Designed to be called from FastAPI *or* a scheduled worker.
+
+Filings are cached under CACHE_DIR/filings keyed by CIK/accession/document,
+sharded by a short hash prefix. Writes go through a temp file + rename, the
+total size is capped with LRU eviction and concurrent downloads of the same
+URL share one fetch. Filings can be stored zstd/gzip-compressed; open_cached()
+streams them back through an mmap without loading the file into a bytes.
 """
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
-import asyncio, httpx, backoff, aiofiles
+from typing import BinaryIO, Dict, Iterator, List
+import asyncio, gzip, hashlib, io, json, mmap, os, re, time, httpx, backoff, aiofiles
 from app.config import settings
+from .sec_ratelimit import sec_limiter
+from app.services.metrics import timed
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is always available
+    zstandard = None
 
 CACHE_DIR = Path(settings.sec_cache_dir)
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+FILINGS_DIR = CACHE_DIR / "filings"
+FILINGS_DIR.mkdir(parents=True, exist_ok=True)
+INDEX_FILE  = FILINGS_DIR / "index.json"
+
+# the original downloader cached documents flat in CACHE_DIR under their file name
+LEGACY_SUFFIXES = {".htm", ".html", ".txt", ".xml"}
+
+_ARCHIVE_RE = re.compile(r"/Archives/edgar/data/(\d+)/(\d+)/([^/?#]+)")
+
+
+def cache_key(url: str) -> str:
+    """``{cik:010d}/{accession}/{document}`` for EDGAR archive URLs, a URL hash otherwise."""
+    m = _ARCHIVE_RE.search(url)
+    if m:
+        cik, acc_no, doc = m.groups()
+        return f"{int(cik):010d}/{acc_no}/{doc}"
+    return f"misc/{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+CODEC_SUFFIX = {None: "", "zstd": ".zst", "gzip": ".gz"}
+
+
+def cache_path(key: str, codec: str | None = None) -> Path:
+    shard = hashlib.sha1(key.encode()).hexdigest()[:2]
+    return FILINGS_DIR / shard / (key + CODEC_SUFFIX[codec])
+
+
+def compress(data: bytes, codec: str | None) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+
+@contextmanager
+def open_cached(path: str | Path) -> Iterator[BinaryIO]:
+    """Binary stream over a cached filing, decompressing on the fly.
+
+    The file is mmapped, so parsers that read from file objects (lxml) pull
+    small chunks straight from the page cache instead of a full in-memory copy.
+    The bytes are yielded as stored: callers decode them with
+    sec_html_parser.detect_encoding(), as both HTML backends do.
+    Compressed filings come back as one-pass streams, so parsers read those
+    into memory before the charset check.
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:  # empty files cannot be mmapped
+            yield io.BytesIO(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if path.suffix == ".zst":
+                with zstandard.ZstdDecompressor().stream_reader(mm) as reader:
+                    yield reader
+            elif path.suffix == ".gz":
+                with gzip.GzipFile(fileobj=mm) as reader:
+                    yield reader
+            else:
+                yield mm
+
+
+def read_cached(path: str | Path) -> bytes:
+    with open_cached(path) as f:
+        return f.read()
+
+
 class SecDownloader:
-    """Download once, serve forever (until you invalidate the cache)."""
-    def __init__(self, max_concurrency: int = 12):
+    """Download once, serve until evicted by the size cap."""
+    def __init__(self, max_concurrency: int = 12, max_cache_bytes: int = None, compression: str | None = "default"):
         self.sem   = asyncio.Semaphore(max_concurrency)
         self.hdrs  = settings.headers
         self._client: httpx.AsyncClient | None = None  # lazily created
+        self.max_cache_bytes = settings.SEC_CACHE_MAX_BYTES if max_cache_bytes is None else max_cache_bytes
+        self.compression = (settings.SEC_CACHE_COMPRESSION or None) if compression == "default" else compression
+        if self.compression not in CODEC_SUFFIX:
+            raise ValueError(f"Unsupported cache compression '{self.compression}'. Use zstd, gzip or None.")
+        if self.compression == "zstd" and zstandard is None:
+            raise ValueError("zstd cache compression requires the 'zstandard' package.")
+        self._remove_legacy_files()
+        self._index: Dict[str, dict] = self._load_index()   # key -> {"size", "atime", "codec"}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flushed = time.monotonic()
 
     async def _ensure_client(self) -> httpx.AsyncClient:
         if self._client is None:
@@ -27,25 +118,145 @@ class SecDownloader:
     async def _fetch(self, url: str) -> bytes:
         client = await self._ensure_client()
         async with self.sem:
+            await sec_limiter.acquire()
             r = await client.get(url)
+            sec_limiter.observe(r.status_code, r.headers.get("Retry-After"))
             r.raise_for_status()
             return r.content
 
-    async def _save(self, url: str, data: bytes) -> Path:
-        path = CACHE_DIR / url.split("/")[-1]
-        async with aiofiles.open(path, "wb") as f:
+    # ---------- cache index ----------
+    def _load_index(self) -> Dict[str, dict]:
+        """What is on disk, with the access times index.json remembers.
+
+        index.json is flushed at most every 5 s, so after a crash it misses the
+        latest filings; trusting it alone would leave those uncounted against
+        the size cap forever. Files it lists that vanished are dropped.
+        """
+        index = self._scan_index()
+        try:
+            with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return index
+        for key, entry in index.items():
+            known = saved.get(key)
+            if known is not None and known.get("codec") == entry["codec"]:
+                entry["atime"] = max(entry["atime"], known.get("atime", 0))
+        return index
+
+    def _remove_legacy_files(self) -> None:
+        """Delete filings the original downloader cached flat in CACHE_DIR.
+
+        They are named by document only, so they can't be mapped to a cache
+        key; nothing reads them any more and they would never be evicted.
+        """
+        removed = 0
+        for path in CACHE_DIR.iterdir():
+            if path.is_file() and path.suffix.lower() in LEGACY_SUFFIXES:
+                removed += path.stat().st_size
+                path.unlink(missing_ok=True)
+        if removed:
+            print(f"Removed {removed} bytes of legacy flat filing cache from {CACHE_DIR}")
+
+    def _scan_index(self) -> Dict[str, dict]:
+        """Index entries for every cached filing, discarding leftovers of interrupted writes."""
+        index = {}
+        for path in FILINGS_DIR.glob("*/**/*"):
+            if not path.is_file():
+                continue
+            st = path.stat()
+            if path.suffix == ".tmp":
+                # another downloader may still be writing it; only leftovers of crashes go
+                if time.time() - st.st_mtime > 3600:
+                    path.unlink(missing_ok=True)
+                continue
+            key = path.relative_to(FILINGS_DIR).as_posix().split("/", 1)[1]
+            codec = next((c for c, suf in CODEC_SUFFIX.items() if suf and key.endswith(suf)), None)
+            if codec:
+                key = key[: -len(CODEC_SUFFIX[codec])]
+            other = index.get(key)
+            if other is not None:
+                # stored under two codecs (SEC_CACHE_COMPRESSION changed): keep the newer
+                if other["atime"] >= st.st_mtime:
+                    path.unlink(missing_ok=True)
+                    continue
+                cache_path(key, other["codec"]).unlink(missing_ok=True)
+            index[key] = {"size": st.st_size, "atime": st.st_mtime, "codec": codec}
+        return index
+
+    async def _flush_index(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self._flushed < 5:
+            return
+        self._flushed = time.monotonic()
+        tmp = INDEX_FILE.with_suffix(".tmp")
+        async with aiofiles.open(tmp, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(self._index))
+        os.replace(tmp, INDEX_FILE)
+
+    def _evict(self, keep: str) -> None:
+        total = sum(e["size"] for e in self._index.values())
+        if total <= self.max_cache_bytes:
+            return
+        for key in sorted(self._index, key=lambda k: self._index[k]["atime"]):
+            if total <= self.max_cache_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self._index.pop(key)
+            total -= entry["size"]
+            cache_path(key, entry.get("codec")).unlink(missing_ok=True)
+
+    # ---------- download ----------
+    async def _save(self, path: Path, data: bytes) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        async with aiofiles.open(tmp, "wb") as f:
             await f.write(data)
+        # rename is atomic: readers never see a partially written filing
+        os.replace(tmp, path)
+        return path
+
+    async def _download(self, key: str, url: str) -> Path:
+        data = await self._fetch(url)
+        if self.compression:
+            data = await asyncio.to_thread(compress, data, self.compression)
+        path = await self._save(cache_path(key, self.compression), data)
+        self._index[key] = {"size": len(data), "atime": time.time(), "codec": self.compression}
+        self._evict(keep=key)
+        await self._flush_index()
         return path
 
     # ---------- public ----------
+    async def get_client(self) -> httpx.AsyncClient:
+        """Shared connection pool for other SEC clients (metadata, tickers)."""
+        return await self._ensure_client()
+
     async def download(self, url: str) -> Path:
-        path = CACHE_DIR / url.split("/")[-1]
-        return path if path.exists() else await self._save(url, await self._fetch(url))
+        """Path of the cached filing; open it with open_cached()/read_cached()."""
+        key = cache_key(url)
+
+        with timed("download", "hit") as stage:
+            entry = self._index.get(key)
+            if entry is not None:
+                path = cache_path(key, entry.get("codec"))
+                if path.exists():
+                    entry["atime"] = time.time()
+                    return path
+
+            # concurrent requests for the same filing await a single fetch
+            stage["result"] = "miss"
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = asyncio.ensure_future(self._download(key, url))
+                self._inflight[key] = fut
+                fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+            return await asyncio.shield(fut)
 
     async def download_many(self, urls: List[str]) -> List[Path]:
         return await asyncio.gather(*(self.download(u) for u in urls))
 
     # graceful shutdown
     async def aclose(self):
+        await self._flush_index(force=True)
         if self._client:
-            await self._client.aclose()
\ No newline at end of file
+            await self._client.aclose()
@@ -1,39 +1,279 @@
 """Batch embedder backed by Chroma (disk) or PGVector (optional)."""
+from collections import OrderedDict
 from pathlib import Path
+from typing import Dict, List
+import hashlib, sqlite3, threading
 import pandas as pd, chromadb
-from llama_index.core import Document, VectorStoreIndex
+from chromadb.errors import ChromaError
+from llama_index.core import VectorStoreIndex
+from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.vector_stores.chroma import ChromaVectorStore
 from app.config import settings
+from app.services.retrieval_cache import CachedRetriever, retrieval_cache
+from app.services.metrics import timed
+from .sec_lexical import LexicalIndex, LexicalRetriever, HybridRetriever
 
 
 CHROMA_DIR = Path(settings.sec_vector_db)
 CHROMA_DIR.mkdir(parents=True, exist_ok=True)
 
+
+def chunk_id(accession: str, text: str) -> str:
+    """Stable ID: the same chunk of the same filing always maps to the same record."""
+    return hashlib.sha256(f"{accession}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class IngestLog:
+    """Accessions whose chunks all reached their collection.
+
+    A row is written only after the last batch of a filing was upserted, so a
+    filing whose ingest was interrupted part-way is picked up again next run.
+    """
+    def __init__(self, path: Path = CHROMA_DIR / "ingested.sqlite3"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS ingested (
+                collection TEXT NOT NULL, accession TEXT NOT NULL, chunks INTEGER NOT NULL,
+                PRIMARY KEY (collection, accession)
+            ) WITHOUT ROWID
+        """)
+        self._db.commit()
+
+    def done(self, collection: str, accession: str) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM ingested WHERE collection = ? AND accession = ?", (collection, accession)
+            ).fetchone() is not None
+
+    def mark(self, collection: str, accession: str, chunks: int) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ingested (collection, accession, chunks) VALUES (?, ?, ?)", (collection, accession, chunks)
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
 class SecEmbedder:
-    def __init__(self, embed_model=None):
+    def __init__(self, embed_model=None, batch_size: int = 64, max_open_indexes: int = 32, max_open_lexical: int = 32):
         self._embed  = embed_model
         self._client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+        self.batch_size = batch_size
+        # warm per-CIK indexes; Chroma queries the live collection, so new
+        # chunks are visible without reopening
+        self._indexes: "OrderedDict[str, VectorStoreIndex]" = OrderedDict()
+        self._max_open = max_open_indexes
+        # BM25 indexes hold an SQLite connection each; evicted ones are closed
+        self._lexical: "OrderedDict[str, LexicalIndex]" = OrderedDict()
+        self._max_lexical = max_open_lexical
+        self._lexical_builds: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._log = IngestLog()
 
     # ------------ helpers ------------
     def _col(self, cik: str):
-        return self._client.get_or_create_collection(f"sec_{cik.zfill(10)}")
+        return self._client.get_or_create_collection(self.collection_name(cik))
+
+    def _has_accession(self, col, accession: str) -> bool:
+        return bool(col.get(where={"accession": accession}, include=[], limit=1)["ids"])
+
+    def _metadata(self, row, ticker: str, accession: str) -> dict:
+        # Chroma only takes str/int/float/bool, so numpy scalars are unwrapped
+        return {
+            "ticker":      str(ticker),
+            "accession":   accession,
+            "form":        str(row.form_type),
+            "date":        str(row.date),
+            "page":        int(row.page_number),
+            "chunk_words": int(row.chunk_word_count)
+        }
+
+    def _upsert(self, col, ids: List[str], texts: List[str], metadatas: List[dict]) -> None:
+        for start in range(0, len(ids), self.batch_size):
+            end = start + self.batch_size
+            with timed("embedding_batch"):
+                embeddings = self._embed.get_text_embedding_batch(texts[start:end])
+            col.upsert(
+                ids=ids[start:end],
+                documents=texts[start:end],
+                embeddings=embeddings,
+                metadatas=metadatas[start:end]
+            )
 
     # ------------ public -------------
-    def ingest_dataframe(self, cik: str, df: pd.DataFrame) -> None:
+    @staticmethod
+    def collection_name(cik: str) -> str:
+        return f"sec_{cik.zfill(10)}"
+
+    def ingest_dataframe(self, cik: str, df: pd.DataFrame, refresh: bool = False, accession: str = None) -> Dict[str, int]:
+        """Idempotently add chunk_text_df rows to the ``sec_{cik}`` collection.
+
+        Chunks already in the collection are skipped without embedding them,
+        so a filing whose earlier ingest stopped part-way is completed rather
+        than skipped. With ``refresh`` filings are diffed instead: chunks whose
+        content hash is unchanged are kept, new ones are embedded and stale
+        ones deleted. Each finished filing is recorded in the IngestLog.
+        Returns counts of new / skipped / updated chunks.
+
+        ``accession`` names the filing ``df`` came from, so a filing without
+        any chunks (single-page Form 4s, short 8-Ks) is recorded as well and
+        not downloaded again on every run.
+        """
+        report = {"new": 0, "skipped": 0, "updated": 0, "deleted": 0}
+        if df.empty:
+            if accession:
+                col = self._col(cik)
+                if refresh:
+                    stale = col.get(where={"accession": accession}, include=[])["ids"]
+                    if stale:
+                        col.delete(ids=stale)
+                        self.lexical(cik).delete(stale)
+                        retrieval_cache.invalidate(col.name)
+                        report["deleted"] = len(stale)
+                self._log.mark(col.name, accession, 0)
+            return report
+
         col = self._col(cik)
-        docs = [
-            Document(
-                text=row["content_chunk"],
-                metadata={
-                    "ticker":      df.iloc[0]["company_name"],
-                    "form":        row["form_type"],
-                    "date":        row["date"],
-                    "page":        row["page_number"],
-                    "chunk_words": row["chunk_word_count"]
-                }
-            )
-            for _, row in df.itertuples()
-        ]
-        VectorStoreIndex.from_documents(docs, embed_model=self._embed, store=col)
+        lexical = self.lexical(cik)
+        ticker = df.iloc[0]["company_name"]
+        if "accession" not in df.columns:
+            # legacy frames: fall back to content hashes only
+            df = df.assign(accession="")
+
+        for accession, group in df.groupby("accession", sort=False, observed=True):
+            group = group.drop_duplicates(subset="content_chunk")
+            ids = [chunk_id(accession, text) for text in group["content_chunk"]]
+
+            if refresh and accession and self._has_accession(col, accession):
+                existing = set(col.get(where={"accession": accession}, include=[])["ids"])
+                status = "updated"
+            else:
+                existing = set(col.get(ids=ids, include=[])["ids"])
+                status = "new"
+
+            todo = [
+                (i, row.content_chunk, self._metadata(row, ticker, accession))
+                for i, row in zip(ids, group.itertuples(index=False))
+                if i not in existing
+            ]
+            stale = existing - set(ids) if status == "updated" else set()
+
+            if todo:
+                new_ids, texts, metadatas = map(list, zip(*todo))
+                self._upsert(col, new_ids, texts, metadatas)
+                # the whole filing, so chunks upserted by an interrupted earlier run get indexed too
+                lexical.add(zip(ids, group["content_chunk"]))
+            if stale:
+                col.delete(ids=list(stale))
+                lexical.delete(stale)
+
+            report[status] += len(todo)
+            report["skipped"] += len(ids) - len(todo)
+            report["deleted"] += len(stale)
+            if accession:
+                self._log.mark(col.name, accession, len(ids))
+
+        if report["new"] or report["updated"] or report["deleted"]:
+            retrieval_cache.invalidate(col.name)
+        return report
+
+    def has_collection(self, cik: str) -> bool:
+        """Whether anything was ever ingested for ``cik``; unlike _col() it creates nothing."""
+        try:
+            self._client.get_collection(self.collection_name(cik))
+        except (ValueError, ChromaError):  # older chromadb raised ValueError
+            return False
+        return True
+
+    def has_accession(self, cik: str, accession: str) -> bool:
+        """True once every chunk of the filing was ingested (partial ingests don't count)."""
+        return self._log.done(self.collection_name(cik), accession)
+
+    def index(self, cik: str) -> VectorStoreIndex:
+        cik = cik.zfill(10)
+        with self._lock:
+            index = self._indexes.get(cik)
+            if index is not None:
+                self._indexes.move_to_end(cik)
+                return index
+
+        vector_store = ChromaVectorStore(chroma_collection=self._col(cik))
+        index = VectorStoreIndex.from_vector_store(vector_store=vector_store, embed_model=self._embed)
+
+        with self._lock:
+            self._indexes[cik] = index
+            self._indexes.move_to_end(cik)
+            while len(self._indexes) > self._max_open:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _open_lexical(self, cik: str) -> LexicalIndex | None:
+        with self._lock:
+            index = self._lexical.get(cik)
+            if index is not None:
+                self._lexical.move_to_end(cik)
+            return index
+
+    def lexical(self, cik: str) -> LexicalIndex:
+        """BM25 index of ``sec_{cik}``; built from the collection on first use if missing.
+
+        The backfill runs once per CIK under its own lock and the index is only
+        handed out after it finished, so nobody searches a half-built index.
+        """
+        cik = cik.zfill(10)
+        index = self._open_lexical(cik)
+        if index is not None:
+            return index
+
+        with self._lock:
+            build = self._lexical_builds.setdefault(cik, threading.Lock())
+        with build:
+            # another thread may have built it while we waited
+            index = self._open_lexical(cik)
+            if index is not None:
+                return index
+
+            index = LexicalIndex(cik)
+            col = self._col(cik)
+            total = col.count()
+            if len(index) == 0 and total:
+                for offset in range(0, total, 5000):
+                    got = col.get(include=["documents"], limit=5000, offset=offset)
+                    index.add(zip(got["ids"], got["documents"]))
+
+            with self._lock:
+                self._lexical[cik] = index
+                self._lexical_builds.pop(cik, None)
+                evicted = []
+                while len(self._lexical) > self._max_lexical:
+                    evicted.append(self._lexical.popitem(last=False)[1])
+        # retrievers still holding an evicted index reopen it on their next search
+        for old in evicted:
+            old.close()
+        return index
+
+    def retriever(self, cik: str, k: int = 20, mode: str = "vector", alpha: float = 0.5):
+        """Retriever over ``sec_{cik}``.
+
+        mode: "vector" (dense, through the shared retrieval cache), "lexical"
+        (BM25 only, never calls the embedding model) or "hybrid" (both, fused).
+        Blocking: the first lexical/hybrid use of a CIK backfills its BM25 index.
+        """
+        if mode == "lexical":
+            return LexicalRetriever(self.lexical(cik), self._col(cik), k)
+
+        if mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode '{mode}'")
 
-    def retriever(self, cik: str, k: int = 20):
-        return VectorStoreIndex.from_collection(self._col(cik)).as_retriever(k)
+        # hybrid fuses a wider candidate pool from each side
+        candidates = k if mode == "vector" else 2 * k
+        inner = VectorIndexRetriever(index=self.index(cik), similarity_top_k=candidates)
+        vector = CachedRetriever(inner, self.collection_name(cik), candidates)
+        if mode == "vector":
+            return vector
+        lexical = LexicalRetriever(self.lexical(cik), self._col(cik), candidates)
+        return HybridRetriever(vector, lexical, k, alpha)
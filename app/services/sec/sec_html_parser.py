@@ -0,0 +1,278 @@
+"""
+HTML backends for SECAnalyzingClient.clean_data.
+
+Every backend takes a str, bytes or binary file object and turns a filing
+into ``(pages, cells)``:
+  pages -> cleaned page texts, split on top-level <hr> elements
+  cells -> (table_number, table_title, row, column, text) for every <td>
+
+"html.parser" is the original BeautifulSoup implementation and stays the
+reference; "lxml" parses in C and walks the tree once for text, treating
+table cells as removed instead of decomposing them. Both decode bytes with
+the charset picked by detect_encoding(), so cp1252/latin-1 filings come out
+the same from either backend.
+
+The two only agree on well-formed markup. Legacy EDGAR HTML with unclosed
+<p>/<td> is repaired differently: html.parser nests each unclosed tag in the
+previous one, so an <hr> after "<P>a<P>b" is not a top-level page break and
+"<TD>Cash<TD>1,234" gives the first cell the text "Cash1,234", while libxml2
+closes the tags (more pages, cell "Cash"). html.parser therefore stays the
+default; pass "lxml" explicitly where that difference is acceptable.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+import codecs, mmap, multiprocessing
+import numpy as np
+
+try:
+    import lxml.html
+except ImportError:  # optional fast backend
+    lxml = None
+
+
+Cell = Tuple[int, str, int, int, str]
+NO_TITLE = "No Title Found"
+
+# bs4's get_text() ignores strings inside these tags (Script, Stylesheet, ...)
+_HIDDEN_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+
+_SNIFF_BYTES = 1 << 16    # a BOM or <meta charset> has to be near the start
+_DECODE_CHUNK = 1 << 20
+
+
+def _decodes(data: bytes, encoding: str) -> bool:
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for start in range(0, len(data), _DECODE_CHUNK):
+            decoder.decode(data[start:start + _DECODE_CHUNK])
+        decoder.decode(b"", final=True)
+    except (LookupError, UnicodeDecodeError):
+        return False
+    return True
+
+
+def detect_encoding(data: bytes) -> str:
+    """Charset of a filing, in the order bs4's UnicodeDammit tries them.
+
+    A BOM or declared charset (<meta charset>, <?xml encoding?>) is used if
+    the whole document decodes with it, then UTF-8, then windows-1252 (older
+    EDGAR filings are often cp1252/latin-1 without any declaration). The
+    check runs chunk by chunk, so no decoded copy of the filing is kept.
+    """
+    head = data[:_SNIFF_BYTES]
+    _, bom = EncodingDetector.strip_byte_order_mark(head)
+    declared = EncodingDetector.find_declared_encoding(head, is_html=True)
+    for encoding in dict.fromkeys(e for e in (bom, declared, "utf-8") if e):
+        if _decodes(data, encoding):
+            # Python's canonical name ("iso8859-1", "cp1252") is one libxml2 knows
+            return codecs.lookup(encoding).name
+    return "cp1252"
+
+
+def split_pages(blocks: Iterable[Optional[str]]) -> List[str]:
+    """Group top-level text blocks into pages; ``None`` marks an <hr>."""
+    pages = []
+    current = []
+    for block in blocks:
+        if block is None:
+            texts = " ".join(current).strip()
+            if texts:
+                pages.append(texts)
+            current = []
+        elif block:
+            current.append(block.replace("\n", " ").strip())
+
+    if current:
+        pages.append(" ".join(current).strip())
+    return pages
+
+
+# ---------- BeautifulSoup (reference) ----------
+def bs4_table_title(table) -> str:
+    parent_div = table.find_parent("div")
+    if parent_div:
+        prev_div = parent_div.find_previous_sibling("div")
+        if prev_div:
+            title_text = prev_div.get_text(strip=True)
+            if title_text:
+                return title_text
+            else:
+                prev_div = prev_div.find_previous_sibling("div")
+            if prev_div:
+                return prev_div.get_text(strip=True)
+    return NO_TITLE
+
+
+def parse_bs4(html: str | bytes | BinaryIO) -> Tuple[List[str], List[Cell]]:
+    if hasattr(html, "read"):
+        html = html.read()
+    encoding = None if isinstance(html, str) else detect_encoding(html)
+    soup = BeautifulSoup(html, "html.parser", from_encoding=encoding)
+    tables = soup.find_all("table")
+
+    cells = []
+    for i, table in enumerate(tables):
+        table_title = bs4_table_title(table)
+        for x, tr in enumerate(table.find_all("tr")):
+            for y, data in enumerate(tr.find_all("td")):
+                cells.append((i, table_title, x, y, data.get_text(strip=True)))
+
+    for table in tables:
+        for tr in table.find_all("tr"):
+            for data in tr.find_all("td"):
+                data.decompose()
+
+    def blocks():
+        for element in soup.body.children:
+            if element.name == "hr":
+                yield None
+            else:
+                yield element.get_text(" ", strip=True)
+
+    return split_pages(blocks()), cells
+
+
+# ---------- lxml ----------
+def _collect(el, out: list, skip) -> None:
+    if el.text:
+        out.append(el.text)
+    for child in el:
+        # comments / PIs have a non-str tag: drop their text, keep their tail
+        if isinstance(child.tag, str) and child.tag not in _HIDDEN_TAGS and child not in skip:
+            _collect(child, out, skip)
+        if child.tail:
+            out.append(child.tail)
+
+
+def _lxml_text(el, sep: str = "", skip=frozenset()) -> str:
+    """Equivalent of bs4 ``get_text(sep, strip=True)`` on an lxml element."""
+    out = []
+    _collect(el, out, skip)
+    return sep.join(s for s in (part.strip() for part in out) if s)
+
+
+def lxml_table_title(table) -> str:
+    # lxml elements are falsy when childless, so compare against None
+    parent_div = next(table.iterancestors("div"), None)
+    if parent_div is not None:
+        prev_div = next(parent_div.itersiblings("div", preceding=True), None)
+        if prev_div is not None:
+            title_text = _lxml_text(prev_div)
+            if title_text:
+                return title_text
+            prev_div = next(prev_div.itersiblings("div", preceding=True), None)
+            if prev_div is not None:
+                return _lxml_text(prev_div)
+    return NO_TITLE
+
+
+def parse_lxml(html: str | bytes | BinaryIO) -> Tuple[List[str], List[Cell]]:
+    if isinstance(html, str):
+        # lxml refuses str input that carries an <?xml encoding=...?> declaration
+        html = html.encode("utf-8")
+        encoding = "utf-8"
+    else:
+        if hasattr(html, "read") and not isinstance(html, mmap.mmap):
+            # decompressing streams can't be rewound after the charset check
+            html = html.read()
+        encoding = detect_encoding(html)
+    parser = lxml.html.HTMLParser(encoding=encoding, huge_tree=True)
+    if isinstance(html, mmap.mmap):
+        # the charset check slices the mmap without moving its position, then
+        # libxml2 consumes it incrementally
+        doc = lxml.html.parse(html, parser=parser).getroot()
+    else:
+        doc = lxml.html.document_fromstring(html, parser=parser)
+
+    cells = []
+    removed = set()
+    for i, table in enumerate(doc.iter("table")):
+        table_title = lxml_table_title(table)
+        for x, tr in enumerate(table.iter("tr")):
+            for y, data in enumerate(tr.iter("td")):
+                cells.append((i, table_title, x, y, _lxml_text(data)))
+                removed.add(data)
+
+    body = doc.body
+
+    def blocks():
+        if body.text:
+            yield body.text.strip()
+        for child in body:
+            if isinstance(child.tag, str):
+                yield None if child.tag == "hr" else _lxml_text(child, " ", removed)
+            if child.tail:
+                yield child.tail.strip()
+
+    return split_pages(blocks()), cells
+
+
+PARSERS: Dict[str, Callable[[str | bytes | BinaryIO], Tuple[List[str], List[Cell]]]] = {
+    "html.parser": parse_bs4,
+}
+if lxml is not None:
+    PARSERS["lxml"] = parse_lxml
+
+# lxml is opt-in: it does not match html.parser on unclosed tags (see above)
+DEFAULT_PARSER = "html.parser"
+
+
+def get_parser(name: str | None = None) -> Callable[[str | bytes | BinaryIO], Tuple[List[str], List[Cell]]]:
+    name = name or DEFAULT_PARSER
+    if name not in PARSERS:
+        raise ValueError(f"Unknown HTML parser backend '{name}'. Available: {sorted(PARSERS)}")
+    return PARSERS[name]
+
+
+# ---------- process pool ----------
+def parse_columns(html: str | bytes | BinaryIO, parser: str | None = None) -> dict:
+    """Parse one filing and return cells as column arrays.
+
+    Runs inside pool workers, so the result is what crosses the process
+    boundary: int32 arrays plus string lists (repeated titles pickle once).
+    """
+    pages, cells = get_parser(parser)(html)
+    table_number, table_title, row, column, data = zip(*cells) if cells else ((),) * 5
+    return {
+        "pages":        pages,
+        "table_number": np.asarray(table_number, dtype=np.int32),
+        "table_title":  list(table_title),
+        "row":          np.asarray(row, dtype=np.int32),
+        "column":       np.asarray(column, dtype=np.int32),
+        "data":         list(data),
+    }
+
+
+def parse_file(path: str, parser: str | None = None) -> dict:
+    """parse_columns for a cached filing; only the path crosses into the worker."""
+    from .sec_downloader import open_cached
+
+    with open_cached(path) as f:
+        return parse_columns(f, parser)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+
+
+def parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process-wide pool for HTML parsing; recreated if the size changes."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != max_workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        # never fork the server: it runs Chroma/SQLite/llama.cpp threads, and a
+        # child forked while one of them holds a lock can deadlock on it
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
+        _pool_workers = max_workers
+    return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
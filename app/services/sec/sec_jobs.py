@@ -0,0 +1,177 @@
+"""
+Background queue for long-running filing analyses.
+
+A job is one ticker: fetch its filing list, then run
+SECAnalyzingClient.parse_filings against the persistent per-CIK stores
+(Chroma + BM25 + Parquet tables). ``workers`` jobs run at once, all of their
+EDGAR traffic at bulk priority so interactive requests still get through.
+Submitting a job identical to one that is queued or running returns that job
+instead of starting another. Progress is the analyzer's per-stage filing
+counts (fetched, parsed, chunked, embedded).
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import asyncio, time, uuid
+from .sec_analyze_service import SECAnalyzingClient
+from .sec_ratelimit import bulk_priority
+
+
+ACTIVE = ("queued", "running")
+
+
+class Job:
+    def __init__(self, key: tuple, ticker: str, top: int, forms: Optional[List[str]], refresh: bool):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.ticker = ticker
+        self.top = top
+        self.forms = forms
+        self.refresh = refresh
+        self.status = "queued"      # queued | running | done | failed | cancelled
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.client: Optional[SECAnalyzingClient] = None
+        self.progress: Dict[str, int] = {}
+        self.report: Dict[str, int] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "ticker": self.ticker,
+            "top": self.top,
+            "forms": self.forms,
+            "refresh": self.refresh,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": dict(self.client.progress) if self.client is not None else self.progress,
+            "report": self.report,
+        }
+
+
+class JobQueue:
+    def __init__(self, components, downloader, metadata_client, workers: int = 2, max_queued: int = 5000, max_history: int = 2000):
+        self.components = components          # provides "embedding_model" and "embedder"
+        self.downloader = downloader
+        self.metadata_client = metadata_client
+        self.workers = workers
+        self.max_history = max_history
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[tuple, Job] = {}  # dedupe key -> queued/running job
+        self._tasks: List[asyncio.Task] = []
+
+    # ---------- public ----------
+    def submit(self, ticker: str, top: int = 5, forms: Optional[List[str]] = None, refresh: bool = False) -> tuple[Job, bool]:
+        """-> (job, created). Raises asyncio.QueueFull when the backlog is full."""
+        ticker = ticker.upper()
+        forms = sorted(set(forms)) if forms else None
+        key = (ticker, top, tuple(forms or ()), refresh)
+
+        job = self._active.get(key)
+        if job is not None:
+            return job, False
+
+        job = Job(key, ticker, top, forms, refresh)
+        self._queue.put_nowait(job)
+        self._active[key] = job
+        self._jobs[job.id] = job
+        self._trim()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, status: str = None) -> List[Job]:
+        return [j for j in self._jobs.values() if status is None or j.status == status]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in ACTIVE:
+            return job
+        if job.task is not None:
+            job.task.cancel()       # running: the worker records the cancellation
+        else:
+            self._finish(job, "cancelled")  # queued: the worker skips it
+        return job
+
+    def metrics(self) -> Dict[str, int]:
+        counts = {s: 0 for s in ("queued", "running", "done", "failed", "cancelled")}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, "backlog": self._queue.qsize(), **counts}
+
+    # ---------- worker ----------
+    def _finish(self, job: Job, status: str, error: str = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        if job.client is not None:
+            job.progress = dict(job.client.progress)
+            job.report = dict(job.client.ingest_report)
+            job.client = None       # drop frames / index references
+        if self._active.get(job.key) is job:
+            del self._active[job.key]
+
+    def _trim(self) -> None:
+        # forget the oldest finished jobs once the history is full
+        for job_id in [i for i, j in self._jobs.items() if j.status not in ACTIVE]:
+            if len(self._jobs) <= self.max_history:
+                break
+            del self._jobs[job_id]
+
+    async def _analyze(self, job: Job) -> None:
+        embedding = await self.components.get("embedding_model")
+        embedder = await self.components.get("embedder")
+
+        job.client = client = SECAnalyzingClient(
+            job.ticker, embedding, downloader=self.downloader, embedder=embedder
+        )
+        with bulk_priority():
+            meta, ok = await client.afetch_metadata(job.top, self.metadata_client, job.forms)
+            if not ok:
+                raise RuntimeError(meta)
+            client.fill_filings()
+            await client.parse_filings(keep_frames=False, refresh=job.refresh)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started = time.time()
+                job.task = asyncio.create_task(self._analyze(job))
+                try:
+                    await job.task
+                    self._finish(job, "done")
+                except asyncio.CancelledError:
+                    if not job.task.cancelled():
+                        raise       # the worker itself is being stopped
+                    self._finish(job, "cancelled")
+                except Exception as e:
+                    print(f"Job {job.id} ({job.ticker}) failed: {e}")
+                    self._finish(job, "failed", str(e))
+                finally:
+                    job.task = None
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for job in self._jobs.values():
+            if job.task is not None:
+                job.task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
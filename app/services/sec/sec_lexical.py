@@ -0,0 +1,207 @@
+"""
+Per-CIK BM25 index over filing chunks.
+
+Each CIK gets one SQLite file under SEC_LEXICAL_DIR holding an inverted index
+(term -> chunk id, term frequency) plus chunk lengths; chunk IDs are the same
+as in the ``sec_{cik}`` Chroma collection, so lexical and vector hits can be
+fused and the chunk text is read back from Chroma by ID. The index is updated
+by SecEmbedder.ingest_dataframe together with the collection. Numbers keep
+their decimals and lose thousands separators, so "$1,234.5" matches "1234.5".
+Words split on apostrophes and hyphens and drop a possessive "'s", so
+"Apple's risk-free" indexes as apple / risk / free. Documents and queries go
+through the same tokenize(); an index built by an older tokenizer is emptied
+on open and backfilled again from the collection.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import asyncio, heapq, math, re, sqlite3, threading
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from app.config import settings
+from app.services.metrics import timed
+
+
+LEXICAL_DIR = Path(settings.sec_lexical_dir)
+LEXICAL_DIR.mkdir(parents=True, exist_ok=True)
+
+# "." and "," only stay inside a term between digits: 1,234.5
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:(?<=\d)[.,]\d+)*")
+_NUM_SEP_RE = re.compile(r"(?<=\d),(?=\d)")
+_POSSESSIVE_RE = re.compile(r"['’]s\b")
+# bump when tokenize() changes: existing indexes are rebuilt
+TOKENIZER_VERSION = 2
+
+
+def tokenize(text: str) -> List[str]:
+    text = _POSSESSIVE_RE.sub("", text.lower())
+    return [_NUM_SEP_RE.sub("", t) for t in _TOKEN_RE.findall(text)]
+
+
+class LexicalIndex:
+    def __init__(self, cik: str, k1: float = 1.2, b: float = 0.75):
+        self.cik = cik.zfill(10)
+        self.k1, self.b = k1, b
+        self.path = LEXICAL_DIR / f"sec_{self.cik}.sqlite3"
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        with self._lock:
+            self._open()
+
+    def _open(self) -> sqlite3.Connection:
+        """The connection, reopened if close() ran while the index was still
+        referenced (SecEmbedder evicts indexes that retrievers may hold). Call
+        with ``_lock`` held."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER NOT NULL) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS postings_id ON postings (id);
+            """)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != TOKENIZER_VERSION:
+                # terms from another tokenizer never match queries: empty it for a backfill
+                self._db.execute("DELETE FROM postings")
+                self._db.execute("DELETE FROM docs")
+                self._db.execute(f"PRAGMA user_version = {TOKENIZER_VERSION}")
+            self._db.commit()
+        return self._db
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._open().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def add(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Index (chunk id, text) pairs; IDs already present are left untouched."""
+        with self._lock:
+            db = self._open()
+            known = set()
+            items = list(items)
+            ids = [i for i, _ in items]
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                known.update(r[0] for r in db.execute(
+                    f"SELECT id FROM docs WHERE id IN ({','.join('?' * len(batch))})", batch
+                ))
+
+            docs, postings = [], []
+            for chunk_id, text in items:
+                if chunk_id in known:
+                    continue
+                known.add(chunk_id)
+                terms = Counter(tokenize(text))
+                docs.append((chunk_id, sum(terms.values())))
+                postings.extend((term, chunk_id, tf) for term, tf in terms.items())
+
+            db.executemany("INSERT INTO docs (id, length) VALUES (?, ?)", docs)
+            db.executemany("INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)", postings)
+            db.commit()
+        return len(docs)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        ids = list(ids)
+        with self._lock:
+            db = self._open()
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                db.execute(f"DELETE FROM postings WHERE id IN ({marks})", batch)
+                db.execute(f"DELETE FROM docs WHERE id IN ({marks})", batch)
+            db.commit()
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """-> [(chunk id, BM25 score)] best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        marks = ",".join("?" * len(terms))
+        with self._lock:
+            db = self._open()
+            n, avg_len = db.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            if not n:
+                return []
+            df = dict(db.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term", terms
+            ))
+            rows = db.execute(
+                f"SELECT p.term, p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id WHERE p.term IN ({marks})",
+                terms
+            ).fetchall()
+
+        idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+        scores: Dict[str, float] = {}
+        for term, chunk_id, tf, length in rows:
+            norm = tf + self.k1 * (1 - self.b + self.b * length / (avg_len or 1))
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf[term] * tf * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _minmax(nodes: List[NodeWithScore]) -> Dict[str, float]:
+    if not nodes:
+        return {}
+    scores = [n.score or 0.0 for n in nodes]
+    lo, hi = min(scores), max(scores)
+    return {n.node.node_id: (s - lo) / (hi - lo) if hi > lo else 1.0 for n, s in zip(nodes, scores)}
+
+
+class LexicalRetriever(BaseRetriever):
+    """BM25 only: no embedding call, chunk text is read from Chroma by ID."""
+
+    def __init__(self, index: LexicalIndex, collection, k: int = 20):
+        super().__init__()
+        self._index = index
+        self._col = collection
+        self.k = k
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        with timed("retrieval", "lexical"):
+            hits = self._index.search(query_bundle.query_str, self.k)
+            if not hits:
+                return []
+            got = self._col.get(ids=[i for i, _ in hits], include=["documents", "metadatas"])
+        found = {i: (doc, meta) for i, doc, meta in zip(got["ids"], got["documents"], got["metadatas"])}
+        return [
+            NodeWithScore(node=TextNode(id_=i, text=found[i][0], metadata=found[i][1] or {}), score=score)
+            for i, score in hits if i in found
+        ]
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return await asyncio.to_thread(self._retrieve, query_bundle)
+
+
+class HybridRetriever(BaseRetriever):
+    """Min-max normalized vector and BM25 scores, mixed as alpha * vector + (1 - alpha) * bm25."""
+
+    def __init__(self, vector: BaseRetriever, lexical: LexicalRetriever, k: int = 20, alpha: float = 0.5):
+        super().__init__()
+        self._vector = vector
+        self._lexical = lexical
+        self.k = k
+        self.alpha = alpha
+
+    def _fuse(self, vector_nodes: List[NodeWithScore], lexical_nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+        vec, lex = _minmax(vector_nodes), _minmax(lexical_nodes)
+        nodes = {n.node.node_id: n.node for n in lexical_nodes}
+        nodes.update((n.node.node_id, n.node) for n in vector_nodes)
+        fused = {i: self.alpha * vec.get(i, 0.0) + (1 - self.alpha) * lex.get(i, 0.0) for i in nodes}
+        best = heapq.nlargest(self.k, fused.items(), key=lambda kv: kv[1])
+        return [NodeWithScore(node=nodes[i], score=score) for i, score in best]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(self._vector.retrieve(query_bundle), self._lexical.retrieve(query_bundle))
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        vector_nodes, lexical_nodes = await asyncio.gather(
+            self._vector.aretrieve(query_bundle), self._lexical.aretrieve(query_bundle)
+        )
+        return self._fuse(vector_nodes, lexical_nodes)
@@ -0,0 +1,126 @@
+"""
+Async client for data.sec.gov submissions JSON.
+Shares the SecDownloader connection pool, caches in memory + on disk and
+revalidates with ETag / Last-Modified.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Tuple
+import asyncio, json, time, httpx, aiofiles
+from .sec_downloader import SecDownloader, CACHE_DIR
+from .sec_ratelimit import sec_limiter
+
+SUBMISSIONS_DIR = CACHE_DIR / "submissions"
+SUBMISSIONS_DIR.mkdir(parents=True, exist_ok=True)
+
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
+
+
+class SecMetadataClient:
+    """Conditional, single-flight fetches of per-CIK submissions metadata."""
+    def __init__(self, downloader: SecDownloader, fresh_for: float = 300, max_entries: int = 256):
+        self.downloader = downloader
+        self.fresh_for  = fresh_for        # seconds served without revalidating
+        self.max_entries = max_entries     # CIKs kept in memory; older ones fall back to disk
+        self._mem: "OrderedDict[str, dict]" = OrderedDict()  # cik -> {"etag", "last_modified", "checked", "data"}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    # ---------- cache helpers ----------
+    def _path(self, cik: str) -> Path:
+        return SUBMISSIONS_DIR / f"CIK{cik}.json"
+
+    async def _load_disk(self, cik: str) -> dict | None:
+        path = self._path(cik)
+        if not path.exists():
+            return None
+        try:
+            async with aiofiles.open(path, "r", encoding="utf-8") as f:
+                entry = json.loads(await f.read())
+        except (OSError, ValueError):
+            return None
+        entry["checked"] = 0.0  # unknown age -> revalidate on first use
+        return entry
+
+    async def _save_disk(self, cik: str, entry: dict) -> None:
+        path = self._path(cik)
+        tmp = path.with_suffix(".tmp")
+        payload = {k: entry[k] for k in ("etag", "last_modified", "data")}
+        async with aiofiles.open(tmp, "w", encoding="utf-8") as f:
+            await f.write(json.dumps(payload))
+        tmp.replace(path)
+
+    def _remember(self, cik: str, entry: dict) -> None:
+        self._mem[cik] = entry
+        self._mem.move_to_end(cik)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    # ---------- fetch ----------
+    async def _refresh(self, cik: str) -> dict:
+        entry = self._mem.get(cik) or await self._load_disk(cik)
+
+        hdrs = {}
+        if entry:
+            if entry.get("etag"):
+                hdrs["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                hdrs["If-Modified-Since"] = entry["last_modified"]
+
+        client = await self.downloader.get_client()
+        await sec_limiter.acquire()
+        try:
+            r = await client.get(SUBMISSIONS_URL.format(cik=cik), headers=hdrs, timeout=10)
+        except httpx.TransportError:
+            if entry:  # upstream unreachable -> serve the stale copy
+                self._remember(cik, entry)
+                return entry
+            raise
+
+        sec_limiter.observe(r.status_code, r.headers.get("Retry-After"))
+        if r.status_code in (429, 503) and entry:  # throttled -> serve the stale copy
+            self._remember(cik, entry)
+            return entry
+        if r.status_code == 304 and entry:
+            entry["checked"] = time.monotonic()
+        else:
+            r.raise_for_status()
+            entry = {
+                "etag":          r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "checked":       time.monotonic(),
+                "data":          r.json(),
+            }
+            await self._save_disk(cik, entry)
+
+        self._remember(cik, entry)
+        return entry
+
+    async def _get_entry(self, cik: str) -> dict:
+        entry = self._mem.get(cik)
+        if entry and time.monotonic() - entry["checked"] < self.fresh_for:
+            self._mem.move_to_end(cik)
+            return entry
+
+        # single-flight: concurrent callers for the same CIK await one request
+        fut = self._inflight.get(cik)
+        if fut is None:
+            fut = asyncio.ensure_future(self._refresh(cik))
+            self._inflight[cik] = fut
+            fut.add_done_callback(lambda _: self._inflight.pop(cik, None))
+        return await asyncio.shield(fut)
+
+    # ---------- public ----------
+    async def submissions(self, cik: str) -> Tuple[dict | str, int]:
+        """Return (submissions JSON, 1) or (error message, 0)."""
+        cik = str(cik).zfill(10)
+        try:
+            entry = await self._get_entry(cik)
+            return entry["data"], 1
+        except (httpx.HTTPError, ValueError) as e:
+            return f"Failed to fetch filings metadata for CIK {cik}: {e}", 0
+
+    def invalidate(self, cik: str | None = None) -> None:
+        if cik is None:
+            self._mem.clear()
+        else:
+            self._mem.pop(str(cik).zfill(10), None)
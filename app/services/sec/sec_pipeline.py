@@ -0,0 +1,54 @@
+"""
+Bounded-queue stage runner used by SECAnalyzingClient.parse_filings.
+
+Each stage is ``(name, async fn, workers)``. Items flow through
+``asyncio.Queue(maxsize=queue_depth)`` between stages, so at most
+``queue_depth`` items wait in front of any stage and a slow stage (embedding)
+holds back the fast ones (download) instead of letting them pile up in memory.
+A stage function may return ``None`` to drop an item.
+"""
+from typing import Any, Awaitable, Callable, Iterable, List, Tuple
+import asyncio
+
+Stage = Tuple[str, Callable[[Any], Awaitable[Any]], int]
+
+_DONE = object()
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[Stage], queue_depth: int = 4) -> None:
+    queues = [asyncio.Queue(maxsize=queue_depth) for _ in stages]
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(stages[0][2]):
+            await queues[0].put(_DONE)
+
+    async def worker(i: int, fn):
+        inbox = queues[i]
+        outbox = queues[i + 1] if i + 1 < len(queues) else None
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            result = await fn(item)
+            if outbox is not None and result is not None:
+                await outbox.put(result)
+
+    async def stage(i: int):
+        _, fn, workers = stages[i]
+        await asyncio.gather(*(worker(i, fn) for _ in range(workers)))
+        # every worker of this stage is done -> release the next stage
+        if i + 1 < len(stages):
+            for _ in range(stages[i + 1][2]):
+                await queues[i + 1].put(_DONE)
+
+    tasks = [asyncio.create_task(feed())] + [asyncio.create_task(stage(i)) for i in range(len(stages))]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # one failing stage would otherwise leave the others blocked on full queues
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,149 @@
+"""
+Process-wide token bucket for outbound EDGAR traffic.
+
+Every request to sec.gov / data.sec.gov takes a token from ``sec_limiter``
+first: SecDownloader and SecMetadataClient with ``await acquire()``, the
+requests-based helpers in sec_url with ``acquire_sync()`` (it sleeps, so
+async routes run those helpers through ``asyncio.to_thread``). The budget
+(SEC_RATE_LIMIT, ~10/s by EDGAR's fair-access policy) is split evenly over
+SEC_RATE_WORKERS processes, so several uvicorn workers stay under it together.
+
+Interactive requests go first: while any is waiting, bulk callers (filing
+ingestion, wrapped in ``bulk_priority()``) hold back. A 429/503 with
+Retry-After pauses the whole bucket instead of letting every caller back off
+on its own.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Dict
+import asyncio, threading, time
+from app.config import settings
+
+
+INTERACTIVE, BULK = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+sec_priority: ContextVar[int] = ContextVar("sec_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_priority():
+    """SEC calls made inside this block (and tasks it spawns) yield to interactive ones."""
+    token = sec_priority.set(BULK)
+    try:
+        yield
+    finally:
+        sec_priority.reset(token)
+
+
+def parse_retry_after(value: str | None, default: float = 1.0) -> float:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class SecRateLimiter:
+    def __init__(self, rate: float = None, burst: float = None):
+        self.rate = rate or settings.SEC_RATE_LIMIT / max(1, settings.SEC_RATE_WORKERS)
+        self.burst = burst or max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+        self.stats = {
+            name: {"acquired": 0, "wait_sum": 0.0, "wait_max": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self.pauses = 0
+
+    def _take(self, priority: int) -> float:
+        """Take a token (-> 0) or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if priority == BULK and self._waiting[INTERACTIVE]:
+                return 1 / self.rate
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _enter(self, priority: int) -> float:
+        with self._lock:
+            self._waiting[priority] += 1
+        return time.monotonic()
+
+    def _leave(self, priority: int, started: float, acquired: bool) -> None:
+        waited = time.monotonic() - started
+        with self._lock:
+            self._waiting[priority] -= 1
+            if acquired:
+                stats = self.stats[PRIORITY_NAMES[priority]]
+                stats["acquired"] += 1
+                stats["wait_sum"] += waited
+                stats["wait_max"] = max(stats["wait_max"], waited)
+
+    async def acquire(self, priority: int = None) -> None:
+        priority = sec_priority.get() if priority is None else priority
+        started, acquired = self._enter(priority), False
+        try:
+            while (delay := self._take(priority)) > 0:
+                await asyncio.sleep(delay)
+            acquired = True
+        finally:
+            self._leave(priority, started, acquired)
+
+    def acquire_sync(self, priority: int = None) -> None:
+        priority = sec_priority.get() if priority is None else priority
+        started, acquired = self._enter(priority), False
+        try:
+            while (delay := self._take(priority)) > 0:
+                time.sleep(delay)
+            acquired = True
+        finally:
+            self._leave(priority, started, acquired)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (server asked us to slow down)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self.pauses += 1
+
+    def observe(self, status_code: int, retry_after: str | None) -> None:
+        """Feed every EDGAR response status through here."""
+        if status_code in (429, 503):
+            self.pause(parse_retry_after(retry_after))
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+                "pauses": self.pauses,
+                "waiting": {PRIORITY_NAMES[p]: n for p, n in self._waiting.items()},
+                **{
+                    name: {
+                        **s,
+                        "wait_avg": s["wait_sum"] / s["acquired"] if s["acquired"] else 0.0
+                    }
+                    for name, s in self.stats.items()
+                },
+            }
+
+
+sec_limiter = SecRateLimiter()
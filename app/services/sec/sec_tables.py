@@ -0,0 +1,155 @@
+"""
+Columnar storage for tables extracted from filings.
+
+table_df (one row per <td>) is written as a hive-partitioned Parquet dataset,
+one file per filing under SEC_TABLES_DIR/ticker=<T>/<accession>.parquet.
+Repeated metadata (accession, form, date, title) is dictionary-encoded, cell
+positions are int32 and each cell gets a typed ``value`` next to its raw
+``text``. query_tables() scans with filters pushed down to partitions and row
+groups and rebuilds every matching table as a row x column grid; a company
+can file several documents of one form on the same date, so tables are keyed
+by accession.
+"""
+from pathlib import Path
+from typing import Dict, List
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from app.config import settings
+
+
+TABLES_DIR = Path(settings.sec_tables_dir)
+TABLES_DIR.mkdir(parents=True, exist_ok=True)
+# outside every ticker=<T> partition, so scans never pick up half-written files
+TMP_DIR = TABLES_DIR / "_tmp"
+TMP_DIR.mkdir(exist_ok=True)
+
+_dict = pa.dictionary(pa.int32(), pa.string())
+SCHEMA = pa.schema([
+    ("accession",    _dict),
+    ("form",         _dict),
+    ("date",         _dict),
+    ("table_number", pa.int32()),
+    ("table_title",  _dict),
+    ("row",          pa.int32()),
+    ("column",       pa.int32()),
+    ("text",         pa.string()),
+    ("value",        pa.float64()),
+])
+
+
+# optional sign or "(", "$", optional "(" after it, the number, optional ")" and "%"
+_NUMBER_RE = (
+    r"(?P<sign>[(\-−])?\s*\$?\s*(?P<paren>\()?\s*"
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d*\.?\d+)\s*\)?\s*%?"
+)
+
+
+def parse_numbers(values: pd.Series) -> pd.Series:
+    """'(1,234)' -> -1234.0, '$(12)' -> -12.0, '$5.6' -> 5.6, '12%' -> 12.0, anything else -> NaN.
+
+    Only cells that are a number as a whole are converted, so dates and
+    identifiers ('2023-12-31', '1-A') stay NaN. SEC tables often split '(1,234'
+    and ')' into separate cells, so an opening parenthesis alone marks a
+    negative value.
+    """
+    parts = values.astype("string").str.strip().str.extract(f"^{_NUMBER_RE}$")
+    number = pd.to_numeric(parts["number"].str.replace(",", "", regex=False), errors="coerce")
+    negative = parts["sign"].notna() | parts["paren"].notna()
+    return number.where(~negative, -number).astype("float64")
+
+
+def to_arrow(table_df: pd.DataFrame) -> pa.Table:
+    data = table_df["data"].astype(str)
+    frame = pd.DataFrame({
+        "accession":    table_df["accession"].astype(str).astype("category"),
+        "form":         table_df["form_type"].astype(str).astype("category"),
+        "date":         table_df["date"].astype(str).astype("category"),
+        "table_number": table_df["table_number"].astype("int32"),
+        "table_title":  table_df["table_title"].astype(str).astype("category"),
+        "row":          table_df["row"].astype("int32"),
+        "column":       table_df["column"].astype("int32"),
+        "text":         data,
+        "value":        parse_numbers(data),
+    })
+    return pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+
+
+def write_tables(table_df: pd.DataFrame, ticker: str, filing_id: str) -> Path | None:
+    """Persist one filing's table_df; rewriting the same filing replaces its file.
+
+    ``filing_id`` (the accession) names the file and fills the accession column.
+    """
+    if table_df.empty:
+        return None
+    part_dir = TABLES_DIR / f"ticker={ticker.upper()}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    path = part_dir / f"{filing_id}.parquet"
+    tmp = TMP_DIR / f"{ticker.upper()}_{filing_id}.parquet.tmp"
+    pq.write_table(to_arrow(table_df.assign(accession=filing_id)), tmp, compression="zstd")
+    tmp.replace(path)
+    return path
+
+
+def _grid(cells: pd.DataFrame) -> tuple[List[List[str]], List[List[float | None]]]:
+    """Text and typed value grids of one table, without all-empty rows/columns."""
+    text = cells.pivot(index="row", columns="column", values="text").fillna("")
+    value = cells.pivot(index="row", columns="column", values="value")
+    # spacer rows/columns are common in SEC layouts
+    keep_rows, keep_cols = (text != "").any(axis=1), (text != "").any(axis=0)
+    text, value = text.loc[keep_rows, keep_cols], value.loc[keep_rows, keep_cols]
+    value = value.astype(object).where(value.notna(), None)
+    return text.values.tolist(), value.values.tolist()
+
+
+def query_tables(
+    ticker: str,
+    form: str = None,
+    date_from: str = None,
+    date_to: str = None,
+    title: str = None,
+    limit: int = 20
+) -> List[Dict]:
+    part_dir = TABLES_DIR / f"ticker={ticker.upper()}"
+    files = sorted(str(path) for path in part_dir.glob("*.parquet"))
+    if not files:
+        return []
+
+    dataset = ds.dataset(files, format="parquet", schema=SCHEMA)
+    expr = pc.scalar(True)
+    if form:
+        expr = expr & (ds.field("form") == form)
+    if date_from:
+        expr = expr & (ds.field("date") >= date_from)
+    if date_to:
+        expr = expr & (ds.field("date") <= date_to)
+    if title:
+        expr = expr & pc.match_substring(ds.field("table_title").cast(pa.string()), title, ignore_case=True)
+
+    cells = dataset.to_table(filter=expr, columns=SCHEMA.names + ["__filename"]).to_pandas()
+    if cells.empty:
+        return []
+    # files written before the accession column existed are named after the filing
+    cells["accession"] = cells["accession"].astype(object).fillna(
+        cells["__filename"].map(lambda name: Path(name).stem)
+    )
+
+    results = []
+    keys = ["form", "date", "accession", "table_number"]
+    for (form_type, date, accession, table_number), group in cells.groupby(keys, sort=True, observed=True):
+        rows, values = _grid(group)
+        results.append({
+            "ticker": ticker.upper(),
+            "accession": accession,
+            "form": form_type,
+            "date": date,
+            "table_number": int(table_number),
+            "table_title": group["table_title"].iloc[0],
+            "rows": rows,
+            "values": values,
+        })
+        if len(results) >= limit:
+            break
+    return results
@@ -1,12 +1,20 @@
 from app.config import settings
+from .sec_ratelimit import sec_limiter
+from app.services.metrics import timed
 import requests
 import json
 import os
+import bisect
+import difflib
+import threading
+from collections import OrderedDict
 import pandas as pd
 
 
 headers = settings.headers
 
+FORM_TYPES = ["10-K", "10-Q", "8-K", "6-K", "20-F", "S-1", "F-1", "13D", "13G", "4", "DEF 14A"]
+
 
 class SECFilingClient:
     def __init__(self, ticker: str):
@@ -20,21 +28,39 @@ class SECFilingClient:
     def fetch_metadata(self, top_doc: int) -> tuple[int | str, int]:
         try:
             url = f'https://data.sec.gov/submissions/CIK{self.cik}.json'
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            filings = response.json()['filings']['recent']
-
-            df = pd.DataFrame.from_dict(filings)
-            df = df[df['form'].isin(["10-K", "10-Q", "8-K", "6-K", "20-F", "S-1", "F-1", "13D", "13G", "4", "DEF 14A"])]
-            df = df.sort_values(by=['form', 'filingDate'], ascending=[True, False])
-            df = df.groupby('form').head(top_doc).reset_index(drop=True)
-
-            self.filing_metadata = df
-            return df, 1
+            with timed("metadata_fetch"):
+                sec_limiter.acquire_sync()
+                response = requests.get(url, headers=headers, timeout=10)
+                sec_limiter.observe(response.status_code, response.headers.get("Retry-After"))
+                response.raise_for_status()
+            return self._select_filings(response.json(), top_doc), 1
         except requests.exceptions.RequestException as e:
             return f"Failed to fetch filings metadata for CIK {self.cik}: {e}", 0
 
 
+    async def afetch_metadata(self, top_doc: int, metadata_client, forms: list[str] | None = None) -> tuple[int | str, int]:
+        """Async variant of fetch_metadata backed by a shared SecMetadataClient."""
+        with timed("metadata_fetch") as stage:
+            submissions, ok = await metadata_client.submissions(self.cik)
+            if not ok:
+                stage["result"] = "error"
+        if not ok:
+            return submissions, 0
+        return self._select_filings(submissions, top_doc, forms), 1
+
+
+    def _select_filings(self, submissions: dict, top_doc: int, forms: list[str] | None = None) -> pd.DataFrame:
+        filings = submissions['filings']['recent']
+
+        df = pd.DataFrame.from_dict(filings)
+        df = df[df['form'].isin(forms or FORM_TYPES)]
+        df = df.sort_values(by=['form', 'filingDate'], ascending=[True, False])
+        df = df.groupby('form').head(top_doc).reset_index(drop=True)
+
+        self.filing_metadata = df
+        return df
+
+
     def get_metadata(self, index: int) -> tuple[str, str, str, str]:
         if self.filing_metadata.empty:
             raise ValueError("filing_metadata is empty. Fetch it first.")
@@ -63,14 +89,22 @@ def update_company_tickers_json():
     local_filename = os.path.join(data_dir, url.split("/")[-1])
 
     try:
+        sec_limiter.acquire_sync()
         with requests.get(url=url, headers=headers, stream=True, timeout=10) as r:
+            sec_limiter.observe(r.status_code, r.headers.get("Retry-After"))
             r.raise_for_status()
             data = r.json()
-            with open(local_filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        # index first: a malformed download never replaces the file on disk
+        ticker_index.load_raw(data)
+        tmp_filename = local_filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_filename, local_filename)
         return local_filename, 1
     except requests.exceptions.RequestException as e:
         return f"Failed to update company_tickers.json: {e}", 0
+    except ValueError as e:
+        return f"Rejected company_tickers.json, keeping the previous index: {e}", 0
     
 
 def load_ticker_json():
@@ -86,19 +120,129 @@ def load_ticker_json():
     return df
 
 
-def find_cik(ticker: str) -> str:
-    """Find and return the CIK number for the given ticker symbol from saved SEC JSON"""
-    try:
-        df = load_ticker_json()
+class TickerIndex:
+    """Process-wide ticker <-> CIK lookup built once from company_tickers.json.
+
+    Readers only ever see a complete snapshot: ``load`` builds new tables and
+    swaps them in with a single attribute assignment.
+    """
+    def __init__(self, fuzzy_cache_size: int = 1024):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._fuzzy_cache: OrderedDict = OrderedDict()   # query -> close matches, per snapshot
+        self._fuzzy_cache_size = fuzzy_cache_size
+
+    def load(self) -> int:
+        filepath = os.path.join("app", "data", "company_tickers.json")
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(
+                "company_tickers.json file not found. Please run update first."
+            )
+
+        with open(filepath, "r", encoding="utf-8") as f:
+            try:
+                raw = json.load(f)
+            except ValueError as e:
+                print(f"Ticker index not reloaded, keeping the previous snapshot: {e}")
+                raise
+
+        return self.load_raw(raw)
+
+    def load_raw(self, raw: dict) -> int:
+        """Build from parsed company_tickers.json; raises ValueError (keeping the
+        current snapshot) when the data is malformed."""
+        try:
+            by_ticker = {}
+            by_cik = {}
+            titles = {}
+            for entry in raw.values():
+                ticker = str(entry["ticker"]).upper()
+                cik = str(entry["cik_str"]).zfill(10)
+                # keep the first occurrence, SEC lists the primary share class first
+                by_ticker.setdefault(ticker, cik)
+                by_cik.setdefault(cik, ticker)
+                titles.setdefault(ticker, entry.get("title", ""))
+        except (AttributeError, KeyError, TypeError) as e:
+            print(f"Ticker index not reloaded, keeping the previous snapshot: malformed entry {e!r}")
+            raise ValueError(f"malformed company_tickers data: {e!r}") from e
+        if not by_ticker:
+            print("Ticker index not reloaded, keeping the previous snapshot: no tickers")
+            raise ValueError("company_tickers data has no tickers")
+
+        # single reference swap -> lookups never observe a half-built index
+        self._snapshot = (by_ticker, by_cik, titles, sorted(by_ticker))
+        self._fuzzy_cache = OrderedDict()
+        return len(by_ticker)
+
+    def _close_matches(self, query: str, sorted_tickers: list, limit: int) -> list:
+        """difflib over tickers sharing the query's first letter, memoized per snapshot."""
+        cache = self._fuzzy_cache
+        key = (query, limit)
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        start = bisect.bisect_left(sorted_tickers, query[0])
+        end = bisect.bisect_left(sorted_tickers, chr(ord(query[0]) + 1))
+        result = difflib.get_close_matches(query, sorted_tickers[start:end], n=limit, cutoff=0.6)
 
-        df['cik_str'] = df['cik_str'].astype(str).str.zfill(10)
+        cache[key] = result
+        if len(cache) > self._fuzzy_cache_size:
+            cache.popitem(last=False)
+        return result
 
+    def _tables(self):
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.load()
+        return self._snapshot
+
+    def cik(self, ticker: str) -> str | None:
+        return self._tables()[0].get(ticker.upper())
+
+    def ticker(self, cik: str | int) -> str | None:
+        return self._tables()[1].get(str(cik).zfill(10))
+
+    def search(self, query: str, limit: int = 10, fuzzy: bool = True) -> list[dict]:
+        by_ticker, _, titles, sorted_tickers = self._tables()
+        query = query.upper()
+
+        # prefix match via binary search on the sorted ticker list
+        start = bisect.bisect_left(sorted_tickers, query)
+        matches = []
+        for ticker in sorted_tickers[start:]:
+            if not ticker.startswith(query) or len(matches) >= limit:
+                break
+            matches.append(ticker)
+
+        if fuzzy and query and len(matches) < limit:
+            for ticker in self._close_matches(query, sorted_tickers, limit):
+                if ticker not in matches:
+                    matches.append(ticker)
+                if len(matches) >= limit:
+                    break
+
+        return [
+            {"ticker": t, "cik": by_ticker[t], "title": titles.get(t, "")}
+            for t in matches
+        ]
+
+
+ticker_index = TickerIndex()
+
+
+def find_cik(ticker: str) -> str:
+    """Find and return the CIK number for the given ticker symbol from the in-memory ticker index"""
+    try:
         ticker = ticker.upper()
 
-        result = df[df["ticker"] == ticker]["cik_str"]
+        with timed("cik_lookup") as stage:
+            CIK = ticker_index.cik(ticker)
+            if CIK is None:
+                stage["result"] = "miss"
 
-        if not result.empty:
-            CIK = str(result.iloc[0])
+        if CIK is not None:
             return CIK, 1
         else:
             error = f"Ticker '{ticker}' not found in the data."
@@ -107,3 +251,17 @@ def find_cik(ticker: str) -> str:
     except (ValueError, KeyError) as e:
         error = f"Error loading or parsing company_tickers.json: {e}"
         return error, 0
+
+
+def find_ticker(cik: str) -> tuple[str, int]:
+    """Reverse lookup: return the primary ticker symbol for a CIK"""
+    try:
+        ticker = ticker_index.ticker(cik)
+
+        if ticker is not None:
+            return ticker, 1
+        else:
+            return f"CIK '{cik}' not found in the data.", 0
+
+    except (ValueError, KeyError) as e:
+        return f"Error loading or parsing company_tickers.json: {e}", 0
@@ -0,0 +1,6 @@
+import os, tempfile
+
+# app.config reads these at import time and the services create their dirs then
+_root = tempfile.mkdtemp(prefix="stockapi-tests-")
+for name in ("SEC_CACHE_DIR", "SEC_VECTOR_DB", "SEC_TABLES_DIR", "SEC_LEXICAL_DIR"):
+    os.environ.setdefault(name, os.path.join(_root, name.lower()))
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.services.components import Components
+
+
+def _broken():
+    raise OSError("model file missing")
+
+
+def test_dependents_of_a_failed_component_fail_too():
+    async def main():
+        components = Components()
+        components.register("embedding_model", _broken)
+        components.register("embedder", lambda model: model, deps=["embedding_model"])
+        components.start()
+        with pytest.raises(RuntimeError, match="dependency embedding_model failed"):
+            await components.get("embedder")
+        return components.report()
+
+    report = asyncio.run(main())
+    assert report["embedding_model"] == {"status": "failed", "seconds": None, "error": "model file missing"}
+    assert report["embedder"]["status"] == "failed"
+    assert report["embedder"]["error"] == "dependency embedding_model failed: model file missing"
+
+
+def test_dependencies_are_passed_to_the_loader():
+    async def main():
+        components = Components()
+        components.register("a", lambda: 2)
+        components.register("b", lambda a: a * 21, deps=["a"])
+        components.start()
+        return await components.get("b"), components.ready()
+
+    assert asyncio.run(main()) == (42, True)
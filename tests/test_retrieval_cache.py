@@ -0,0 +1,27 @@
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from app.services.retrieval_cache import RetrievalCache
+
+
+def _nodes(*texts):
+    return [NodeWithScore(node=TextNode(text=t), score=1.0) for t in texts]
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = RetrievalCache()
+    generation = cache.generation("sec_0000000001")
+    # an ingest finishes while the miss is still searching Chroma
+    cache.invalidate("sec_0000000001")
+    cache.put("sec_0000000001", "revenue", [1.0, 0.0], 5, _nodes("old"), generation)
+
+    assert cache.get_exact("sec_0000000001", "revenue", 5) is None
+    assert cache.stats["stale_puts"] == 1
+
+
+def test_invalidate_only_affects_its_collection():
+    cache = RetrievalCache()
+    generation = cache.generation("Warren_Buffett")
+    cache.invalidate("sec_0000000001")
+    cache.put("Warren_Buffett", "moats", [0.0, 1.0], 5, _nodes("a", "b"), generation)
+
+    assert [n.node.text for n in cache.get_exact("Warren_Buffett", "  Moats ", 1)] == ["a"]
@@ -0,0 +1,49 @@
+import json, os, time
+
+from app.services.sec import sec_downloader
+from app.services.sec.sec_downloader import CACHE_DIR, INDEX_FILE, SecDownloader, cache_path
+
+
+def _write(path, data: bytes, mtime: float = None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_index_is_reconciled_with_disk():
+    now = time.time()
+    listed, unlisted, vanished = "0000000001/a/listed.htm", "0000000001/b/unlisted.htm", "0000000001/c/gone.htm"
+    _write(cache_path(listed), b"x" * 10, now - 100)
+    # written after the last index flush, e.g. right before a crash
+    _write(cache_path(unlisted), b"y" * 20, now - 50)
+    INDEX_FILE.write_text(json.dumps({
+        listed: {"size": 10, "atime": now - 10, "codec": None},
+        vanished: {"size": 30, "atime": now - 10, "codec": None},
+    }))
+    stale_tmp = cache_path("0000000001/d/old.htm").with_suffix(".htm.tmp")
+    live_tmp = cache_path("0000000001/e/new.htm").with_suffix(".htm.tmp")
+    _write(stale_tmp, b"partial", now - 7200)
+    _write(live_tmp, b"partial")
+    legacy = CACHE_DIR / "aapl-20230930.htm"
+    _write(legacy, b"old flat cache")
+
+    index = SecDownloader(compression=None)._index
+
+    assert index[listed] == {"size": 10, "atime": now - 10, "codec": None}
+    assert index[unlisted]["size"] == 20
+    assert vanished not in index
+    assert not stale_tmp.exists() and live_tmp.exists()
+    assert not legacy.exists()
+
+
+def test_filing_stored_under_two_codecs_keeps_the_newer(monkeypatch):
+    key = "0000000002/a/doc.htm"
+    _write(cache_path(key), b"plain", time.time() - 100)
+    _write(cache_path(key, "gzip"), b"gz")
+    monkeypatch.setattr(sec_downloader, "INDEX_FILE", INDEX_FILE.with_name("missing.json"))
+
+    index = SecDownloader(compression=None)._index
+
+    assert index[key]["codec"] == "gzip"
+    assert not cache_path(key).exists()
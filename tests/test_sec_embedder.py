@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from app.services.sec.sec_embedder import SecEmbedder
+
+
+class FakeEmbedding:
+    def __init__(self, fail_after: int = None):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def get_text_embedding_batch(self, texts):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("embedding server went away")
+        return [[float(len(t)), 1.0, 0.5] for t in texts]
+
+
+def _chunks(accession: str, n: int = 10) -> pd.DataFrame:
+    return pd.DataFrame({
+        "company_name": "ACME",
+        "form_type": "10-K",
+        "date": "2024-02-01",
+        "page_number": range(n),
+        "chunk_word_count": 2,
+        "content_chunk": [f"chunk {i} of {accession}" for i in range(n)],
+        "accession": accession,
+    })
+
+
+def test_partial_ingest_is_resumed():
+    embedder = SecEmbedder(FakeEmbedding(fail_after=2), batch_size=3)
+    with pytest.raises(RuntimeError):
+        embedder.ingest_dataframe("11", _chunks("0000000011-24-000001"))
+    assert not embedder.has_accession("11", "0000000011-24-000001")
+
+    embedder._embed = FakeEmbedding()
+    report = embedder.ingest_dataframe("11", _chunks("0000000011-24-000001"))
+    assert report == {"new": 4, "skipped": 6, "updated": 0, "deleted": 0}
+    assert embedder.has_accession("11", "0000000011-24-000001")
+    assert len(embedder.lexical("11")) == 10
+
+
+def test_filing_without_chunks_is_recorded():
+    embedder = SecEmbedder(FakeEmbedding())
+    report = embedder.ingest_dataframe("12", pd.DataFrame(), accession="0000000012-24-000001")
+    assert report == {"new": 0, "skipped": 0, "updated": 0, "deleted": 0}
+    assert embedder.has_accession("12", "0000000012-24-000001")
+    assert embedder._embed.calls == 0
+
+
+def test_has_collection_creates_nothing():
+    embedder = SecEmbedder(FakeEmbedding())
+    assert not embedder.has_collection("13")
+    assert not embedder.has_collection("13")
+    embedder.ingest_dataframe("13", _chunks("0000000013-24-000001", 2))
+    assert embedder.has_collection("13")
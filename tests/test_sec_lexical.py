@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from app.services.sec.sec_lexical import TOKENIZER_VERSION, LexicalIndex, tokenize
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("The Company's risk-free rate", ["the", "company", "rate", "risk", "free"]),
+    ("Apple’s 10-K", ["apple", "10", "k"]),
+    ("Revenue was $1,234.5 million.", ["revenue", "was", "1234.5", "million"]),
+    ("U.S. GAAP, net", ["u", "s", "gaap", "net"]),
+    ("rock'n'roll", ["rock", "n", "roll"]),
+])
+def test_tokenize(text, expected):
+    assert sorted(tokenize(text)) == sorted(expected)
+
+
+def test_possessives_and_hyphenated_terms_are_found():
+    index = LexicalIndex("21")
+    index.add([("a", "The Company's risk-free assets"), ("b", "Apple's revenue"), ("c", "unrelated text")])
+    assert [i for i, _ in index.search("company risk")] == ["a"]
+    assert [i for i, _ in index.search("Apple")] == ["b"]
+    assert [i for i, _ in index.search("risk-free")] == ["a"]
+
+
+def test_index_from_an_older_tokenizer_is_emptied():
+    index = LexicalIndex("22")
+    index.add([("a", "The Company's risk-free assets")])
+    index.close()
+    with sqlite3.connect(index.path) as db:
+        db.execute("PRAGMA user_version = 1")
+
+    reopened = LexicalIndex("22")
+    assert len(reopened) == 0
+    with sqlite3.connect(reopened.path) as db:
+        assert db.execute("PRAGMA user_version").fetchone()[0] == TOKENIZER_VERSION
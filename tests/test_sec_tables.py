@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from app.services.sec import sec_tables
+from app.services.sec.sec_tables import parse_numbers, query_tables, write_tables
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,234", 1234.0),
+    ("(1,234)", -1234.0),
+    ("(1,234", -1234.0),
+    ("$(12)", -12.0),
+    ("$ 5.6", 5.6),
+    ("-7", -7.0),
+    ("−7", -7.0),
+    ("12%", 12.0),
+    (".5", 0.5),
+    ("2023-12-31", None),
+    ("12-31", None),
+    ("1,2,3", None),
+    ("Total", None),
+    ("(", None),
+    ("", None),
+])
+def test_parse_numbers(text, expected):
+    value = parse_numbers(pd.Series([text])).iloc[0]
+    assert pd.isna(value) if expected is None else value == expected
+
+
+def _table_df(value: str) -> pd.DataFrame:
+    return pd.DataFrame({
+        "company_name": "ACME",
+        "form_type": "8-K",
+        "date": "2024-03-01",
+        "table_number": 0,
+        "table_title": "Results",
+        "row": [0, 0],
+        "column": [0, 1],
+        "data": ["Revenue", value],
+    })
+
+
+def test_same_form_and_date_are_kept_apart():
+    write_tables(_table_df("1"), "acme", "0000000001-24-000001")
+    write_tables(_table_df("2"), "acme", "0000000001-24-000002")
+    # leftovers of an interrupted write inside the partition are ignored
+    (sec_tables.TABLES_DIR / "ticker=ACME" / "broken.tmp").write_bytes(b"junk")
+
+    tables = query_tables("acme", form="8-K")
+    assert [t["accession"] for t in tables] == ["0000000001-24-000001", "0000000001-24-000002"]
+    assert [t["values"] for t in tables] == [[[None, 1.0]], [[None, 2.0]]]
+    assert not list(sec_tables.TMP_DIR.iterdir())